@@ -5,6 +5,10 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from dotenv import load_dotenv
+from app.services.cache import TTLCache
+from app.services.http_client import OutboundClient
+from app.services.password_hasher import PasswordHasher
+from sqlalchemy import event
 import os
 
 # Initialize extensions
@@ -12,6 +16,9 @@ db=SQLAlchemy()
 migrate=Migrate()
 jwt=JWTManager()
 cors=CORS()     
+forecast_cache=TTLCache('WEATHER_CACHE')
+outbound=OutboundClient()
+password_hasher=PasswordHasher()
 load_dotenv()
 
 def create_app(test_config=None):
@@ -24,8 +31,11 @@ def create_app(test_config=None):
     # Defined allowed oirgins:
     allowed_origins = [ "https://travel-valet.onrender.com" ]
     
+    # Response headers browser clients need to read (pagination cursor, conditional GETs):
+    exposed_headers = ['X-Next-Cursor', 'ETag']
+
     # Initialize CORS with allowed origin:
-    CORS(app, resources={r"/*":{"origins": allowed_origins}})
+    CORS(app, resources={r"/*":{"origins": allowed_origins}}, expose_headers=exposed_headers)
 
     # Configure app settings:
     if not test_config:
@@ -35,16 +45,75 @@ def create_app(test_config=None):
         
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY') 
+    # GET /expenses page size (default and maximum ?limit=):
+    app.config['EXPENSES_PAGE_SIZE'] = int(os.environ.get('EXPENSES_PAGE_SIZE', 50))
+    app.config['EXPENSES_MAX_PAGE_SIZE'] = int(os.environ.get('EXPENSES_MAX_PAGE_SIZE', 200))
+    # POST /expenses/import: rows per INSERT/transaction, and how many row errors to report back.
+    app.config['EXPENSES_IMPORT_CHUNK_SIZE'] = int(os.environ.get('EXPENSES_IMPORT_CHUNK_SIZE', 1000))
+    app.config['EXPENSES_IMPORT_MAX_ERRORS'] = int(os.environ.get('EXPENSES_IMPORT_MAX_ERRORS', 100))
+    # Most expenses one batch update/delete may touch:
+    app.config['EXPENSES_BATCH_MAX'] = int(os.environ.get('EXPENSES_BATCH_MAX', 5000))
+    # Most operations one POST /packing-list/<id>/items/batch may carry:
+    app.config['ITEMS_BATCH_MAX_OPERATIONS'] = int(os.environ.get('ITEMS_BATCH_MAX_OPERATIONS', 500))
+    # GET /sync: how far before the client's cursor to look for changes (to catch transactions that were
+    # in flight), and how long tombstones of deleted rows are kept (older cursors must resync from scratch).
+    app.config['SYNC_OVERLAP_SECONDS'] = int(os.environ.get('SYNC_OVERLAP_SECONDS', 5))
+    app.config['SYNC_TOMBSTONE_RETENTION_DAYS'] = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+    # GET /search page size (default and maximum ?limit=) and the largest ?offset=:
+    app.config['SEARCH_PAGE_SIZE'] = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    app.config['SEARCH_MAX_PAGE_SIZE'] = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', 100))
+    app.config['SEARCH_MAX_OFFSET'] = int(os.environ.get('SEARCH_MAX_OFFSET', 10000))
+    # GET /export: rows fetched (and streamed out) per batch:
+    app.config['EXPORT_YIELD_PER'] = int(os.environ.get('EXPORT_YIELD_PER', 1000))
+    # Password hashing (werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000").
+    # Stored hashes using other parameters are upgraded on the user's next successful login.
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 32))
     app.config['OPENWEATHER_API_KEY'] = os.environ.get('OPENWEATHER_API_KEY') 
+    # Forecast cache: fresh for WEATHER_CACHE_TTL seconds, then served stale while refreshing
+    # for up to WEATHER_CACHE_STALE_TTL more seconds. Bounded to WEATHER_CACHE_MAXSIZE destinations.
+    app.config['WEATHER_CACHE_TTL'] = int(os.environ.get('WEATHER_CACHE_TTL', 1800))
+    app.config['WEATHER_CACHE_STALE_TTL'] = int(os.environ.get('WEATHER_CACHE_STALE_TTL', 3600))
+    app.config['WEATHER_CACHE_MAXSIZE'] = int(os.environ.get('WEATHER_CACHE_MAXSIZE', 1024))
+    # POST /weather/batch limits: destinations per request, concurrent upstream fetches per request.
+    app.config['WEATHER_BATCH_MAX_DESTINATIONS'] = int(os.environ.get('WEATHER_BATCH_MAX_DESTINATIONS', 20))
+    app.config['WEATHER_BATCH_CONCURRENCY'] = int(os.environ.get('WEATHER_BATCH_CONCURRENCY', 6))
     # Access Yelp environment variables:
     app.config['YELP_API_KEY'] = os.getenv('YELP_API_KEY')
     app.config['YELP_API_URL'] = os.getenv('YELP_API_URL')
+    # How long (seconds) cached Yelp search results are served before refetching:
+    app.config['YELP_CACHE_TTL'] = int(os.getenv('YELP_CACHE_TTL', 21600))
+    # Pages of 50 results fetched per Yelp search, and the largest `limit` /recommendations accepts:
+    app.config['YELP_SEARCH_PAGES'] = int(os.getenv('YELP_SEARCH_PAGES', 3))
+    app.config['RECOMMENDATIONS_MAX_LIMIT'] = int(os.getenv('RECOMMENDATIONS_MAX_LIMIT', 50))
+
+    # Outbound HTTP client settings (one keep-alive pool and circuit breaker per provider):
+    app.config['OUTBOUND_PROVIDERS'] = ['openweather', 'yelp']
+    app.config['OPENWEATHER_CONNECT_TIMEOUT'] = float(os.environ.get('OPENWEATHER_CONNECT_TIMEOUT', 3.05))
+    app.config['OPENWEATHER_READ_TIMEOUT'] = float(os.environ.get('OPENWEATHER_READ_TIMEOUT', 5))
+    app.config['YELP_CONNECT_TIMEOUT'] = float(os.environ.get('YELP_CONNECT_TIMEOUT', 3.05))
+    app.config['YELP_READ_TIMEOUT'] = float(os.environ.get('YELP_READ_TIMEOUT', 8))
+    app.config['OUTBOUND_RETRIES'] = int(os.environ.get('OUTBOUND_RETRIES', 2))
+    app.config['OUTBOUND_BACKOFF_FACTOR'] = float(os.environ.get('OUTBOUND_BACKOFF_FACTOR', 0.3))
+    app.config['OUTBOUND_POOL_MAXSIZE'] = int(os.environ.get('OUTBOUND_POOL_MAXSIZE', 20))
+    app.config['OUTBOUND_BREAKER_FAILURES'] = int(os.environ.get('OUTBOUND_BREAKER_FAILURES', 5))
+    app.config['OUTBOUND_BREAKER_RESET_TIMEOUT'] = float(os.environ.get('OUTBOUND_BREAKER_RESET_TIMEOUT', 30))
+    # Seconds between "Outbound HTTP stats" log lines (pools and breakers, per worker); 0 disables them:
+    app.config['OUTBOUND_STATS_LOG_INTERVAL'] = int(os.environ.get('OUTBOUND_STATS_LOG_INTERVAL', 300))
 
     # Initialize extensions with the app
     db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            from app.services.sql import enable_sqlite_foreign_keys
+            event.listen(db.engine, 'connect', enable_sqlite_foreign_keys)
     migrate.init_app(app, db)
     jwt.init_app(app)
-    cors.init_app(app)
+    cors.init_app(app, expose_headers=exposed_headers)
+    forecast_cache.init_app(app)
+    outbound.init_app(app)
+    password_hasher.init_app(app)
 
     # Import and register routes:
     logging.debug("Importing and registering routes...")
@@ -66,6 +135,15 @@ def create_app(test_config=None):
     from app.routes.dining_routes import dining_routes_bp
     app.register_blueprint(dining_routes_bp)
 
+    from app.routes.export_routes import export
+    app.register_blueprint(export)
+
+    from app.routes.sync_routes import sync
+    app.register_blueprint(sync)
+
+    from app.routes.search_routes import search_bp
+    app.register_blueprint(search_bp)
+
 
     # Import models:
     logging.debug("Importing models...")
@@ -73,6 +151,16 @@ def create_app(test_config=None):
     from app.models.expense import Expense
     from app.models.packing_list import PackingList
     from app.models.item import Item
+    from app.models.city_location import CityLocation
+    from app.models.yelp_search_cache import YelpSearchCache
+    from app.models.expense_summary import ExpenseSummary
+    from app.models.deleted_record import DeletedRecord
+
+    # Register CLI commands:
+    from app.commands import seed_cities, rebuild_expense_summaries, prune_deleted_records
+    app.cli.add_command(seed_cities)
+    app.cli.add_command(rebuild_expense_summaries)
+    app.cli.add_command(prune_deleted_records)
     
     logging.debug("Application setup complete")
     return app
@@ -0,0 +1,102 @@
+import csv
+import logging
+import os
+import click
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from app import db
+
+DEFAULT_CITIES_CSV = os.path.join(os.path.dirname(__file__), 'data', 'cities.csv')
+
+
+# Seed the city_location table from a CSV with city,country,lat,lon columns:
+#   flask seed-cities [path/to/cities.csv]
+@click.command('seed-cities')
+@click.argument('csv_path', required=False, default=DEFAULT_CITIES_CSV)
+@with_appcontext
+def seed_cities(csv_path):
+    from app.models.city_location import CityLocation
+
+    existing = set(db.session.query(CityLocation.city, CityLocation.country).all())
+    new_locations = []
+
+    with open(csv_path, newline='') as csv_file:
+        for row in csv.DictReader(csv_file):
+            city, country = CityLocation.normalize(row['city'], row.get('country'))
+            if (city, country) in existing:
+                continue
+            existing.add((city, country))
+            new_locations.append(
+                CityLocation(city=city, country=country, lat=float(row['lat']), lon=float(row['lon']))
+            )
+
+    db.session.add_all(new_locations)
+    db.session.commit()
+    logging.debug(f'Seeded {len(new_locations)} cities from {csv_path}')
+    click.echo(f'Seeded {len(new_locations)} new cities.')
+
+
+# Recompute the expense_summary rollups from scratch with a single GROUP BY and compare them
+# with the incrementally maintained rows:
+#   flask rebuild-expense-summaries          report differences, then replace the rollups
+#   flask rebuild-expense-summaries --check  only report differences (exit code 1 if any)
+@click.command('rebuild-expense-summaries')
+@click.option('--check', is_flag=True, help='Only compare, do not rewrite the rollups.')
+@with_appcontext
+def rebuild_expense_summaries(check):
+    from app.models.expense import Expense
+    from app.models.expense_summary import ExpenseSummary
+    from app.services.sql import sql_month_of
+
+    month = sql_month_of(Expense.date)
+    rebuilt = {
+        (user_id, category, row_month): (total, count)
+        for user_id, category, row_month, total, count in db.session.query(
+            Expense.user_id, Expense.category, month, func.sum(Expense.amount), func.count(Expense.id)
+        ).group_by(Expense.user_id, Expense.category, month)
+    }
+    incremental = {
+        (row.user_id, row.category, row.month): (row.total, row.count)
+        for row in ExpenseSummary.query.all()
+    }
+
+    mismatches = []
+    for key in sorted(set(rebuilt) | set(incremental), key=str):
+        expected_total, expected_count = rebuilt.get(key, (0, 0))
+        actual_total, actual_count = incremental.get(key, (0, 0))
+        if expected_count != actual_count or abs(expected_total - actual_total) > 0.005:
+            mismatches.append(key)
+            click.echo(f'Mismatch for user {key[0]}, {key[1]}, {key[2]}: '
+                       f'expected {expected_total:.2f} / {expected_count}, found {actual_total:.2f} / {actual_count}')
+    click.echo(f'{len(mismatches)} of {len(rebuilt)} rollup rows differ.')
+
+    if check:
+        if mismatches:
+            raise SystemExit(1)
+        return
+
+    ExpenseSummary.query.delete()
+    db.session.add_all([
+        ExpenseSummary(user_id=user_id, category=category, month=row_month, total=total, count=count)
+        for (user_id, category, row_month), (total, count) in rebuilt.items()
+    ])
+    db.session.commit()
+    logging.debug(f'Rebuilt {len(rebuilt)} expense summary rows')
+    click.echo(f'Rebuilt {len(rebuilt)} rollup rows.')
+
+
+# Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS (clients with older cursors get a
+# 410 from GET /sync and resync from scratch). Run it daily:
+#   flask prune-deleted-records
+@click.command('prune-deleted-records')
+@with_appcontext
+def prune_deleted_records():
+    from flask import current_app
+    from app.models.deleted_record import DeletedRecord
+
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+    pruned = DeletedRecord.query.filter(DeletedRecord.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    logging.debug(f'Pruned {pruned} tombstones older than {cutoff}')
+    click.echo(f'Pruned {pruned} tombstones.')
@@ -0,0 +1,39 @@
+from datetime import datetime
+from app import db
+from app.services.text import normalize_text
+
+# Cached city -> coordinates lookups, so /weather can skip the geocoding round trip.
+# city and country are stored normalized (trimmed, lowercased); country is '' when unknown.
+class CityLocation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    city = db.Column(db.String(100), nullable=False)
+    country = db.Column(db.String(100), nullable=False, default='')
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    dateSaved = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('city', 'country', name='uq_city_location_city_country'),
+    )
+
+    # Normalize a (city, country) query so "Paris, FR" and " paris ,fr" are the same place:
+    @staticmethod
+    def normalize(city, country=None):
+        return normalize_text(city), normalize_text(country)
+
+    # Look up a normalized (city, country) pair. Without a country, any stored country matches:
+    @classmethod
+    def lookup(cls, city, country=''):
+        query = cls.query.filter_by(city=city)
+        if country:
+            query = query.filter_by(country=country)
+        return query.order_by(cls.id).first()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'city': self.city,
+            'country': self.country,
+            'lat': self.lat,
+            'lon': self.lon
+        }
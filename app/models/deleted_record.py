@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+
+# Tombstones for deleted expenses, packing lists and items, so GET /sync can tell offline clients
+# what to drop. A deleted packing list's items don't get their own tombstones: the list's covers them.
+class DeletedRecord(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    resource = db.Column(db.String(20), nullable=False)    # 'expense', 'packing_list' or 'item'
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # GET /sync reads a user's tombstones newer than its cursor:
+    __table_args__ = (
+        db.Index('ix_deleted_record_user_id_deleted_at', 'user_id', 'deleted_at'),
+    )
+
+    # Record deletions in the caller's transaction, as one executemany INSERT:
+    @classmethod
+    def record(cls, user_id, resource, record_ids):
+        deleted_at = datetime.utcnow()
+        rows = [{'user_id': user_id, 'resource': resource, 'record_id': id, 'deleted_at': deleted_at} for id in record_ids]
+        if rows:
+            db.session.execute(insert(cls), rows)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from app import db
 
 class Expense(db.Model):
@@ -8,6 +9,15 @@ class Expense(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     # user = db.relationship("User", back_populates="expenses")
     category=db.Column(db.String(100), nullable=False)
+    # Set on insert and every update (ORM or bulk statement); GET /sync returns rows changed since a cursor:
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # GET /expenses filters on user_id (and optionally category) and pages through (date, id):
+    __table_args__ = (
+        db.Index('ix_expense_user_id_date_id', 'user_id', 'date', 'id'),
+        db.Index('ix_expense_user_id_category_date_id', 'user_id', 'category', 'date', 'id'),
+        db.Index('ix_expense_user_id_updated_at', 'user_id', 'updated_at'),
+    )
 
     def to_dict(self):
  
@@ -0,0 +1,50 @@
+from app import db
+from app.services.sql import upsert_insert
+
+# Running totals of a user's expenses per (category, month), kept up to date by the expense
+# routes in the same transaction as the expense change. month is 'YYYY-MM'.
+class ExpenseSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category', 'month', name='uq_expense_summary_user_category_month'),
+    )
+
+    # 'YYYY-MM' rollup key of a date; app.services.sql.sql_month_of computes the same key in SQL:
+    @staticmethod
+    def month_key(date):
+        return date.strftime('%Y-%m')
+
+    # Add {(category, month): (amount, count)} deltas to the user's rollup rows.
+    # Runs in the caller's transaction as one executemany upsert; rows whose count drops to zero are removed.
+    @classmethod
+    def apply_deltas(cls, user_id, deltas):
+        table = cls.__table__
+        rows = [
+            {'user_id': user_id, 'category': category, 'month': month, 'total': amount, 'count': count}
+            for (category, month), (amount, count) in deltas.items()
+            if amount != 0 or count != 0
+        ]
+        if not rows:
+            return
+
+        insert = upsert_insert(table)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=['user_id', 'category', 'month'],
+            set_={'total': table.c.total + insert.excluded.total, 'count': table.c.count + insert.excluded.count}
+        ), rows)
+        if any(row['count'] < 0 for row in rows):
+            db.session.execute(table.delete().where(table.c.user_id == user_id, table.c.count <= 0))
+
+    def to_dict(self):
+        return {
+            'category': self.category,
+            'month': self.month,
+            'total': round(self.total, 2),
+            'count': self.count
+        }
@@ -1,3 +1,4 @@
+from datetime import datetime
 from app import db
 
 class Item(db.Model):
@@ -5,8 +6,40 @@ class Item(db.Model):
     description = db.Column(db.String(100), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     packed = db.Column(db.Boolean, default=False)
-    listId = db.Column(db.Integer, db.ForeignKey('packing_list.id'), nullable=False)
+    # Items are removed by the database when their list is deleted (see PackingList.items):
+    listId = db.Column(db.Integer, db.ForeignKey('packing_list.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Set on insert and every update (ORM or bulk statement); GET /sync returns items changed since a cursor:
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # GET /sync walks the user's lists and reads each one's recently changed items:
+    __table_args__ = (
+        db.Index('ix_item_listId_updated_at', 'listId', 'updated_at'),
+    )
+
+
+    # Validate the item fields present in a request body (description, quantity, packed) and return
+    # them as column values. New items need a description. Raises ValueError.
+    @staticmethod
+    def parse_fields(data, new=False):
+        values = {}
+        if new or 'description' in data:
+            description = data.get('description')
+            if not description or not isinstance(description, str) or len(description) > 100:
+                raise ValueError('Item description is required (at most 100 characters)')
+            values['description'] = description
+        if data.get('quantity') is not None:
+            quantity = data['quantity']
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0:
+                raise ValueError(f'Invalid quantity: {quantity}')
+            values['quantity'] = quantity
+        if data.get('packed') is not None:
+            if not isinstance(data['packed'], bool):
+                raise ValueError(f"Invalid packed value: {data['packed']}")
+            values['packed'] = data['packed']
+        if new:
+            values.setdefault('quantity', 1)
+            values.setdefault('packed', False)
+        return values
 
     def to_dict(self):
         return {
@@ -4,18 +4,31 @@ from app import db
 class PackingList(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     listName = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     dateSaved = db.Column(db.DateTime, default=datetime.utcnow) 
-    items = db.relationship('Item', backref='packing_list', lazy=True, cascade='all, delete-orphan')
+    # Templates ("beach trip", "business trip") are lists meant to be cloned for each trip:
+    is_template = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # Set on insert and every update; GET /sync returns lists changed since a cursor:
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # passive_deletes: deleting a list is one DELETE; ON DELETE CASCADE on item.listId removes the items
+    # without the ORM loading them first.
+    items = db.relationship('Item', backref='packing_list', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_packing_list_user_id_updated_at', 'user_id', 'updated_at'),
+    )
 
 # Converts PackingList instance into a dictionary:
 # Helps with serialization to send data as JSON in API responses.
-    def to_dict(self):
-        return {
+    def to_dict(self, include_items=True):
+        data = {
             'id': self.id,
             'listName': self.listName,     
             'userId': self.user_id,
             'dateSaved': self.dateSaved.strftime('%Y-%m-%d'),
-            'items': [item.to_dict() for item in self.items]
+            'isTemplate': self.is_template,
         }
+        if include_items:
+            data['items'] = [item.to_dict() for item in self.items]
+        return data
         
\ No newline at end of file
@@ -1,22 +1,39 @@
-from app import db
+from app import db, password_hasher
+from sqlalchemy import select, update
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
 # class User(UserMixin, db.Model):
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False)
+    username = db.Column(db.String(100), nullable=False, unique=True, index=True)
     password = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(100), nullable=True)
+    # Bumped by every change to the user's expenses, packing lists or items; ETags of their collections derive from it:
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Defines one-to-many relationship to PackingList model:
     packing_lists = db.relationship('PackingList', backref='user', lazy=True)
 
+    # Hashing runs on the password hasher's thread pool, not on the event loop:
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return password_hasher.verify(self.password, password)
+
+    # True when the stored hash uses outdated parameters (see PASSWORD_HASH_METHOD):
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password)
+
+    # Run in the caller's transaction, so the new version commits (or rolls back) with the change itself:
+    @classmethod
+    def bump_data_version(cls, user_id):
+        db.session.execute(update(cls).where(cls.id == user_id).values(data_version=cls.data_version + 1))
+
+    # One primary-key lookup; no collection table is touched:
+    @classmethod
+    def data_version_of(cls, user_id):
+        return db.session.execute(select(cls.data_version).where(cls.id == user_id)).scalar()
 
     def to_dict(self):
  
@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+from app import db
+from app.services.text import normalize_text
+
+# Normalized Yelp search results per (location, term), shared by all workers and restarts.
+# Filtering and ranking run on top of the cached results, so a different filter never refetches.
+class YelpSearchCache(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    location = db.Column(db.String(200), nullable=False)
+    term = db.Column(db.String(200), nullable=False, default='')
+    results = db.Column(db.JSON, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('location', 'term', name='uq_yelp_search_cache_location_term'),
+    )
+
+    # Normalize a search so "Paris " / "paris" and "Tacos"/"tacos" share a cache row:
+    @staticmethod
+    def normalize(location, term=None):
+        return normalize_text(location), normalize_text(term)
+
+    def is_fresh(self, ttl):
+        return self.fetched_at >= datetime.utcnow() - timedelta(seconds=ttl)
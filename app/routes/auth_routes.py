@@ -3,6 +3,8 @@ logging.basicConfig(level=logging.DEBUG)
 from flask import Blueprint, jsonify, request
 from app import db
 from app.models.user import User
+from app.services.password_hasher import HasherBusyError
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import create_access_token, jwt_required
 
 
@@ -18,13 +20,20 @@ def register():
     if not username or not password or not email:
         logging.error('Missing required fields')
         return jsonify({'message': 'Username, password, email are required'}), 400
-    if User.query.filter_by(username=username).first():
+    new_user=User(username=username, email=email)
+    try:
+        new_user.set_password(password)
+    except HasherBusyError:
+        logging.error('Password hasher queue is full')
+        return jsonify({'message': 'Server busy, please try again'}), 503
+    # The unique index on username rejects duplicates, no need to look the user up first:
+    try:
+        db.session.add(new_user)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
         logging.error(f'User {username} already exists')
         return jsonify({'message': 'User already exists'}), 400
-    new_user=User(username=username, email=email)
-    new_user.set_password(password)
-    db.session.add(new_user)
-    db.session.commit()
     logging.debug(f'User {username} registered successfully')
     return jsonify({'message': 'User registered!'})
 
@@ -36,7 +45,18 @@ def login():
 
     user = User.query.filter_by(username=username).first()
 
-    if user and user.check_password(password):
+    try:
+        valid = user is not None and user.check_password(password)
+        # Upgrade hashes made with outdated parameters while we have the plain password:
+        if valid and user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+            logging.debug(f'Rehashed password for user {username}')
+    except HasherBusyError:
+        logging.error('Password hasher queue is full')
+        return jsonify({'message': 'Server busy, please try again'}), 503
+
+    if valid:
         access_token = create_access_token(identity={'id':user.id})
         return jsonify(access_token=access_token, user=username), 200
 
@@ -1,11 +1,152 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
-import requests
+from app import db, outbound
+from app.models.yelp_search_cache import YelpSearchCache
+from app.services.errors import UpstreamError
+from app.services.single_flight import SingleFlight
+from app.services.sql import upsert_insert
+from datetime import datetime
+from gevent.pool import Pool
+import heapq
 import logging
 
 # Define flask blueprint:
 dining_routes_bp = Blueprint('dining_routes', __name__)
 
+# Identical concurrent searches share one Yelp request:
+yelp_flights = SingleFlight()
+
+
+# Yelp returns at most 50 results per page and won't page past 240 results in total:
+YELP_PAGE_SIZE = 50
+YELP_MAX_RESULTS = 240
+
+# Categories excluded from recommendations unless the caller passes its own `exclude` list:
+DEFAULT_EXCLUDED_CATEGORIES = {'Fast Food', 'Food Trucks', 'Deli', 'Food Stands'}
+
+
+# Keep a few selected fields of a Yelp business:
+def normalize_business(business):
+    return {
+        'id': business.get('id'),
+        'name': business.get('name'),
+        # In the data is an array of dictionaries, each dictionary has a key: 'title'
+        'categories': [category['title'] for category in business.get('categories', [])],
+        # In the data display_address is an array of strings and it's part of a dictionary named 'location'
+        'address': ' '.join(business.get('location', {}).get('display_address', [])),
+        'website': business.get('url'),
+        'phone': business.get('display_phone'),
+        'rating': business.get('rating'),
+        'review_count': business.get('review_count'),
+        'image_url': business.get('image_url')
+    }
+
+
+# Fetch businesses for a search from Yelp: YELP_SEARCH_PAGES pages of 50, requested concurrently.
+# Returns (businesses, complete). Raises UpstreamError if no page could be fetched; a failed later page
+# only shortens the results, and complete is then False.
+def fetch_businesses(location, term):
+    # Set up headers for Yelp API requests, including API key from app config
+    headers = {'Authorization': f"Bearer {current_app.config['YELP_API_KEY']}"}
+
+    # Construct the full URL for the Yelp request - ("/businesses/search" -- endpoint from Yelp)
+    api_url = f"{current_app.config['YELP_API_URL']}/businesses/search"
+
+    # At least one page, however YELP_SEARCH_PAGES is set:
+    search_pages = max(current_app.config['YELP_SEARCH_PAGES'], 1)
+    offsets = range(0, min(search_pages * YELP_PAGE_SIZE, YELP_MAX_RESULTS), YELP_PAGE_SIZE)
+
+    def fetch_page(offset):
+        # Set up parameters for Yelp API request
+        params = {
+            'location': location,
+            'term': term,
+            'categories': 'restaurants, bars',
+            'sort_by': 'rating',
+            'limit': min(YELP_PAGE_SIZE, YELP_MAX_RESULTS - offset),
+            'offset': offset
+        }
+        try:
+            response = outbound.get('yelp', api_url, headers=headers, params=params)
+        except UpstreamError as e:
+            return e
+        if response.status_code != 200:
+            logging.error(f"Yelp API request failed with status code {response.status_code} (offset {offset})")
+            return UpstreamError('Failed to fetch data from Yelp API', 500)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            logging.error(f"Yelp API returned an unreadable response (offset {offset})")
+            return UpstreamError('Failed to fetch data from Yelp API', 502)
+        return payload.get('businesses', [])
+
+    pages = Pool(len(offsets)).map(fetch_page, offsets)
+
+    if all(isinstance(page, UpstreamError) for page in pages):
+        raise pages[0]
+
+    # Yelp can repeat a business across pages:
+    seen = set()
+    businesses = []
+    for page in pages:
+        if isinstance(page, UpstreamError):
+            continue
+        for business in page:
+            if business.get('id') not in seen:
+                seen.add(business.get('id'))
+                businesses.append(normalize_business(business))
+    return businesses, not any(isinstance(page, UpstreamError) for page in pages)
+
+
+# Stream businesses through the filters into a bounded heap that keeps the `limit` most reviewed.
+# Memory stays O(limit) no matter how many businesses are scanned.
+def top_recommendations(businesses, limit, min_rating, excluded_categories):
+    candidates = (
+        business for business in businesses
+        if (business['rating'] or 0) >= min_rating
+        and not any(category in excluded_categories for category in business['categories'])
+    )
+    return heapq.nlargest(limit, candidates, key=lambda business: business['review_count'] or 0)
+
+
+# Fetch a search from Yelp and store the normalized results in the shared cache table.
+# Results missing a failed page are returned but not cached, so the next request refetches them.
+def refresh_cached_search(key, location, term):
+    businesses, complete = fetch_businesses(location, term)
+    if not complete:
+        logging.warning(f'Not caching partial Yelp results for {key}')
+        return businesses
+
+    insert = upsert_insert(YelpSearchCache.__table__).values(
+        location=key[0], term=key[1], results=businesses, fetched_at=datetime.utcnow()
+    )
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['location', 'term'],
+        set_={'results': insert.excluded.results, 'fetched_at': insert.excluded.fetched_at}
+    ))
+    db.session.commit()
+    return businesses
+
+
+# Cached businesses for a search, refetching from Yelp once the cached row is older than YELP_CACHE_TTL.
+# If Yelp is failing, an expired row is still better than an error.
+def get_businesses(location, term):
+    key = YelpSearchCache.normalize(location, term)
+    cached = YelpSearchCache.query.filter_by(location=key[0], term=key[1]).first()
+    if cached is not None and cached.is_fresh(current_app.config['YELP_CACHE_TTL']):
+        return cached.results
+
+    try:
+        return yelp_flights.do(key, lambda: refresh_cached_search(key, location, term))
+    except UpstreamError:
+        if cached is None:
+            raise
+        logging.warning(f'Serving expired Yelp results for {key}')
+        return cached.results
+
+
 @dining_routes_bp.route('/recommendations', methods=['GET'])
 @jwt_required()     # Requires a valid JWT token to access this route
 def dining_recommendations():
@@ -16,58 +157,25 @@ def dining_recommendations():
     # Validate required parameters:
     if not location:
         return jsonify({'error': 'City or location are required'}), 400
-    
-    # Set up headers for Yelp API requests, including API key from app config
-    headers = {'Authorization': f"Bearer {current_app.config['YELP_API_KEY']}"}
-    
-    # Set up parameters for Yelp API request
-    params = {
-        'location': location,
-        'term': term,
-        'categories': 'restaurants, bars',
-        'sort_by': 'rating',
-        'limit': 50    # Yelp's max number of results returned
-    }
 
-    # Construct the full URL for the Yelp request - ("/businesses/search" -- endpoint from Yelp)
-    api_url = f"{current_app.config['YELP_API_URL']}/businesses/search"
+    # Optional ranking parameters:
+    try:
+        limit = int(request.args.get('limit', 5))
+        min_rating = float(request.args.get('min_rating', 4.0))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer and min_rating a number'}), 400
+    if not 1 <= limit <= current_app.config['RECOMMENDATIONS_MAX_LIMIT']:
+        return jsonify({'error': f"limit must be between 1 and {current_app.config['RECOMMENDATIONS_MAX_LIMIT']}"}), 400
+
+    if 'exclude' in request.args:
+        excluded_categories = {category.strip() for category in request.args['exclude'].split(',') if category.strip()}
+    else:
+        excluded_categories = DEFAULT_EXCLUDED_CATEGORIES
+
+    try:
+        businesses = get_businesses(location, term)
+    except UpstreamError as e:
+        return jsonify({'error': e.message}), e.status_code
 
-    response = requests.get(api_url, headers=headers, params=params)
-    if response.status_code != 200:
-        logging.error(f"Yelp API request failed with status code {response.status_code}")
-        return jsonify({'error': 'Failed to fetch data from Yelp API'}), 500
-
-    data = response.json()
-    # return jsonify(data) # Returns all available data for the different businesses
-    recommendations = []   # List of dictionaries with a few selected fields
-
-    for business in data.get('businesses', []):
-        recommendations.append({
-            'id': business.get('id'),
-            'name': business.get('name'),
-            # In the data is an array of dictionaries, each dictionary has a key: 'title'
-            'categories': [category['title'] for category in business.get('categories', [])],
-            # In the data display_address is an array of strings and it's part of a dictionary named 'location'
-            'address': ' '.join(business.get('location', {}).get('display_address', [])),
-            'website': business.get('url'),
-            'phone': business.get('display_phone'),
-            'rating': business.get('rating'),
-            'review_count': business.get('review_count'),
-            'image_url': business.get('image_url')
-        })
-
-    # Additional local filtering:
-    # Exclude specific categories:
-    excluded_categories = {'Fast Food', 'Food Trucks', 'Deli', 'Food Stands'}
-    recommendations = [rec for rec in recommendations if not any(
-        category in excluded_categories for category in rec['categories'])]
-
-    # filter out bussinesses with rating less than 4.0
-    recommendations = [rec for rec in recommendations if rec['rating'] >= 4.0]
-
-    # sort by review count - descending:
-    recommendations = sorted(
-        recommendations, key=lambda x: x['review_count'], reverse=True)
-
-    # Only return top 5 recommendations:
-    return jsonify({'recommendations': recommendations[:5]})
+    # Filter by category and rating, and keep the most reviewed:
+    return jsonify({'recommendations': top_recommendations(businesses, limit, min_rating, excluded_categories)})
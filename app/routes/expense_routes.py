@@ -1,10 +1,20 @@
 import logging
 logging.basicConfig(level=logging.DEBUG)
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from app import db
 from app.models.expense import Expense
+from app.models.expense_summary import ExpenseSummary
+from app.models.user import User
+from app.models.deleted_record import DeletedRecord
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from datetime import datetime
+from sqlalchemy import and_, or_, insert, update, delete, func
+from app.services.sql import sql_month_of
+from app.services.etag import collection_etag, not_modified
+import base64
+import csv
+import json
+import math
 
 
 expense = Blueprint('expense', __name__, url_prefix="/expenses")
@@ -36,6 +46,11 @@ def add_expense():
             category=category
         )
         db.session.add(new_expense)
+        # Keep the category/month rollup in step, in the same transaction:
+        ExpenseSummary.apply_deltas(current_user, {
+            (category, ExpenseSummary.month_key(new_expense.date)): (float(amount), 1)
+        })
+        User.bump_data_version(current_user)
         db.session.commit()
         
         # return jsonify({"message": "Expense added successfully"}), 201
@@ -46,18 +61,407 @@ def add_expense():
         return jsonify({"msg": str(e)}), 500
 
 
+# Opaque pagination cursor: the (date, id) of the last expense on the previous page.
+def encode_cursor(expense):
+    return base64.urlsafe_b64encode(f"{expense.date.strftime('%Y-%m-%d')}:{expense.id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    date, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+    return datetime.strptime(date, '%Y-%m-%d').date(), int(id)
+
+
+# Build the WHERE criteria for the current user's expenses from the optional
+# start/end (YYYY-MM-DD, inclusive) and category filters. Raises ValueError on bad dates, or on
+# non-text values (batch requests pass a JSON object here).
+def expense_filters(current_user, args):
+    if any(args.get(name) is not None and not isinstance(args.get(name), str) for name in ('start', 'end', 'category')):
+        raise ValueError('"start", "end" and "category" must be text')
+    filters = [Expense.user_id == current_user]
+    if args.get('start'):
+        filters.append(Expense.date >= datetime.strptime(args['start'], '%Y-%m-%d').date())
+    if args.get('end'):
+        filters.append(Expense.date <= datetime.strptime(args['end'], '%Y-%m-%d').date())
+    if args.get('category'):
+        filters.append(Expense.category == args['category'])
+    return filters
+
+
+# Route to get the current user's expenses, newest first.
+# Without ?limit= or ?cursor= every matching expense is returned, as before pagination existed.
+# With either, results are keyset-paginated on (date, id): pass the X-Next-Cursor response header
+# back as ?cursor= to get the next page. Page size is ?limit= (default EXPENSES_PAGE_SIZE).
+# Responses carry an ETag; polling with If-None-Match gets a 304 until the user's expenses change.
 @expense.route('', methods=['GET'])
 @jwt_required()
 def get_expenses():
     current_user = get_jwt_identity().get('id')
-    expenses = Expense.query.filter_by(user_id=current_user).order_by(Expense.date.desc()).all()
-    return jsonify([{
+
+    # Each filter/page combination is its own representation:
+    etag = collection_etag(current_user, 'expenses', request.query_string.decode())
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    try:
+        limit = int(request.args.get('limit', current_app.config['EXPENSES_PAGE_SIZE']))
+        filters = expense_filters(current_user, request.args)
+        if request.args.get('cursor'):
+            cursor_date, cursor_id = decode_cursor(request.args['cursor'])
+            # Rows strictly after the cursor in (date desc, id desc) order:
+            filters.append(or_(
+                Expense.date < cursor_date,
+                and_(Expense.date == cursor_date, Expense.id < cursor_id)
+            ))
+    except ValueError:
+        return jsonify({'message': 'Invalid limit, cursor or date filter'}), 400
+
+    if not 1 <= limit <= current_app.config['EXPENSES_MAX_PAGE_SIZE']:
+        return jsonify({'message': f"limit must be between 1 and {current_app.config['EXPENSES_MAX_PAGE_SIZE']}"}), 400
+
+    query = Expense.query.filter(*filters).order_by(Expense.date.desc(), Expense.id.desc())
+    if paginated:
+        # Fetch one extra row to know whether there's a next page:
+        expenses = query.limit(limit + 1).all()
+        has_more = len(expenses) > limit
+        expenses = expenses[:limit]
+    else:
+        expenses = query.all()
+        has_more = False
+
+    response = jsonify([{
         'id': expense.id,
         'amount': expense.amount,
         'description': expense.description,
         'category': expense.category,
         'date': expense.date.strftime('%Y-%m-%d')
     } for expense in expenses])
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_cursor(expenses[-1])
+    response.set_etag(etag)
+    return response
+
+# Validate one imported row with the same rules as add_expense (all fields required, YYYY-MM-DD date),
+# plus the checks the database would otherwise enforce. Returns column values or raises ValueError.
+def parse_expense_row(data):
+    amount = data.get('amount')
+    description = data.get('description')
+    date = data.get('date')
+    category = data.get('category')
+
+    if not amount or not description or not date or not category:
+        raise ValueError('All fields are required')
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid amount: {amount}')
+    # float() accepts "nan" and "inf", which the database and JSON responses can't take:
+    if not math.isfinite(amount):
+        raise ValueError(f'Invalid amount: {amount}')
+    try:
+        date = datetime.strptime(date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid date: {date}')
+    if not isinstance(description, str) or not isinstance(category, str):
+        raise ValueError('Description and category must be text')
+    if len(description) > 100 or len(category) > 100:
+        raise ValueError('Description and category must be at most 100 characters')
+
+    return {'amount': amount, 'description': description, 'date': date, 'category': category}
+
+
+# Decode the uploaded body line by line. A line that isn't valid UTF-8 is noted in `bad_lines`
+# (and decoded with replacement characters), so only the row it belongs to is rejected.
+# A leading byte-order mark (Excel's "CSV UTF-8" adds one) is dropped from the first line.
+def decode_lines(stream, bad_lines):
+    for line_number, line in enumerate(stream, start=1):
+        encoding = 'utf-8-sig' if line_number == 1 else 'utf-8'
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError:
+            bad_lines.append(line_number)
+            yield line.decode(encoding, errors='replace')
+
+
+# Read the uploaded body one row at a time, yielding (row number, dict or ValueError):
+def read_import_rows(stream, file_format):
+    bad_lines = []
+    lines = decode_lines(stream, bad_lines)
+    if file_format == 'csv':
+        # The reader pulls exactly the lines of one record, so a bad line is flagged on its own row:
+        for row_number, row in enumerate(csv.DictReader(lines), start=1):
+            if bad_lines:
+                bad_lines.clear()
+                yield row_number, ValueError('Row is not valid UTF-8')
+                continue
+            yield row_number, row
+    else:
+        for row_number, line in enumerate(lines, start=1):
+            if bad_lines:
+                bad_lines.clear()
+                yield row_number, ValueError('Line is not valid UTF-8')
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield row_number, ValueError('Invalid JSON')
+                continue
+            yield row_number, row if isinstance(row, dict) else ValueError('Each line must be a JSON object')
+
+
+# Insert one chunk of validated rows and update the rollups, in one transaction.
+# An executemany of one compiled INSERT: PostgreSQL (psycopg2) sends it as batched multi-row
+# INSERT ... VALUES statements, SQLite as a native executemany.
+def insert_expense_chunk(current_user, rows):
+    deltas = {}
+    for row in rows:
+        key = (row['category'], ExpenseSummary.month_key(row['date']))
+        amount, count = deltas.get(key, (0, 0))
+        deltas[key] = (amount + row['amount'], count + 1)
+
+    db.session.execute(insert(Expense.__table__), rows)
+    ExpenseSummary.apply_deltas(current_user, deltas)
+    User.bump_data_version(current_user)
+    db.session.commit()
+
+
+# Route to import many expenses at once from CSV (amount,description,date,category header) or NDJSON.
+# The body is streamed row by row and inserted in chunks of EXPENSES_IMPORT_CHUNK_SIZE, each in its own
+# transaction, so memory stays flat however large the file is. Invalid rows are reported, not fatal.
+@expense.route('/import', methods=['POST'])
+@jwt_required()
+def import_expenses():
+    current_user = get_jwt_identity().get('id')
+
+    file_format = request.args.get('format')
+    if file_format is None:
+        file_format = 'csv' if request.mimetype == 'text/csv' else 'ndjson' if request.mimetype in ('application/x-ndjson', 'application/jsonl') else None
+    if file_format not in ('csv', 'ndjson'):
+        return jsonify({'message': 'Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson'}), 415
+
+    chunk_size = current_app.config['EXPENSES_IMPORT_CHUNK_SIZE']
+    max_errors = current_app.config['EXPENSES_IMPORT_MAX_ERRORS']
+    imported = 0
+    failed = 0
+    errors = []   # Only the first max_errors are returned, the rest are counted
+    chunk = []
+    chunk_rows = []
+
+    def flush():
+        nonlocal imported, failed
+        try:
+            insert_expense_chunk(current_user, chunk)
+            imported += len(chunk)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f'Expense import chunk failed: {e}')
+            failed += len(chunk)
+            if len(errors) < max_errors:
+                errors.append({'rows': f'{chunk_rows[0]}-{chunk_rows[-1]}', 'message': 'Could not save these rows'})
+        chunk.clear()
+        chunk_rows.clear()
+
+    for row_number, row in read_import_rows(request.stream, file_format):
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            values = parse_expense_row(row)
+        except ValueError as e:
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append({'row': row_number, 'message': str(e)})
+            continue
+
+        values['user_id'] = current_user
+        chunk.append(values)
+        chunk_rows.append(row_number)
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    logging.debug(f'Imported {imported} expenses for user {current_user}, {failed} failed')
+    return jsonify({'imported': imported, 'failed': failed, 'errors': errors}), 200
+
+
+# Resolve the expenses a batch request targets: either {"ids": [...]} or {"filter": {start, end, category}}.
+# Returns (ids of the current user's matching expenses, requested ids that were rejected).
+# Raises ValueError on a malformed request.
+def batch_targets(current_user, data):
+    ids = data.get('ids')
+    filters = data.get('filter')
+    max_targets = current_app.config['EXPENSES_BATCH_MAX']
+
+    if (ids is None) == (filters is None):
+        raise ValueError('Send either "ids" or "filter"')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(id, int) and not isinstance(id, bool) for id in ids):
+            raise ValueError('"ids" must be a list of integers')
+        if len(ids) > max_targets:
+            raise ValueError(f'At most {max_targets} ids per request')
+        criteria = [Expense.user_id == current_user, Expense.id.in_(ids)]
+    else:
+        if not isinstance(filters, dict):
+            raise ValueError('"filter" must be an object')
+        criteria = expense_filters(current_user, filters)
+
+    # Lock the matched rows for the rest of the transaction (a no-op on SQLite, which locks the whole database):
+    matched = [id for (id,) in db.session.query(Expense.id).filter(*criteria).limit(max_targets + 1).with_for_update()]
+    if len(matched) > max_targets:
+        raise ValueError(f'The filter matches more than {max_targets} expenses, narrow it down')
+
+    found = set(matched)
+    rejected = [id for id in ids if id not in found] if ids is not None else []
+    return matched, rejected
+
+
+# Totals and counts per (category, month) of the given expenses, from one GROUP BY:
+def rollup_of(ids, sign=1):
+    month = sql_month_of(Expense.date)
+    rows = db.session.query(Expense.category, month, func.sum(Expense.amount), func.count(Expense.id)) \
+        .filter(Expense.id.in_(ids)).group_by(Expense.category, month)
+    return {(category, row_month): (sign * total, sign * count) for category, row_month, total, count in rows}
+
+
+# Validate the changes of a batch update; same field rules as a single expense update.
+def parse_batch_changes(changes):
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError('"changes" must be a non-empty object')
+    unknown = set(changes) - {'amount', 'description', 'date', 'category'}
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+
+    values = {}
+    if 'amount' in changes:
+        try:
+            values['amount'] = float(changes['amount'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid amount: {changes['amount']}")
+        # float() turns true into 1.0 and accepts "nan" / "inf":
+        if isinstance(changes['amount'], bool) or not math.isfinite(values['amount']):
+            raise ValueError(f"Invalid amount: {changes['amount']}")
+    if 'date' in changes:
+        try:
+            values['date'] = datetime.strptime(changes['date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date: {changes['date']}")
+    for field in ('description', 'category'):
+        if field in changes:
+            if not changes[field] or not isinstance(changes[field], str) or len(changes[field]) > 100:
+                raise ValueError(f'{field} must be a non-empty string of at most 100 characters')
+            values[field] = changes[field]
+    return values
+
+
+# Route to update many expenses at once with one set-based UPDATE:
+# PATCH /expenses/batch {"ids": [1, 2]} or {"filter": {...}}, plus {"changes": {"category": "Food"}}
+@expense.route('/batch', methods=['PATCH'])
+@jwt_required()
+def batch_update_expenses():
+    current_user = get_jwt_identity().get('id')
+    data = request.get_json(silent=True) or {}
+
+    try:
+        values = parse_batch_changes(data.get('changes'))
+        ids, rejected = batch_targets(current_user, data)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        if ids:
+            # Description-only changes don't move anything between rollup rows:
+            touches_rollup = bool(set(values) & {'amount', 'date', 'category'})
+            if touches_rollup:
+                before = rollup_of(ids, sign=-1)
+            db.session.execute(
+                update(Expense).where(Expense.user_id == current_user, Expense.id.in_(ids)).values(**values),
+                execution_options={'synchronize_session': False}
+            )
+            if touches_rollup:
+                deltas = before
+                for key, (total, count) in rollup_of(ids).items():
+                    old_total, old_count = deltas.get(key, (0, 0))
+                    deltas[key] = (old_total + total, old_count + count)
+                ExpenseSummary.apply_deltas(current_user, deltas)
+            User.bump_data_version(current_user)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+    return jsonify({'updated': ids, 'rejected': rejected}), 200
+
+
+# Route to delete many expenses at once with one set-based DELETE:
+# DELETE /expenses/batch {"ids": [1, 2]} or {"filter": {...}}
+@expense.route('/batch', methods=['DELETE'])
+@jwt_required()
+def batch_delete_expenses():
+    current_user = get_jwt_identity().get('id')
+    data = request.get_json(silent=True) or {}
+
+    try:
+        ids, rejected = batch_targets(current_user, data)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        if ids:
+            deltas = rollup_of(ids, sign=-1)
+            db.session.execute(
+                delete(Expense).where(Expense.user_id == current_user, Expense.id.in_(ids)),
+                execution_options={'synchronize_session': False}
+            )
+            DeletedRecord.record(current_user, 'expense', ids)
+            ExpenseSummary.apply_deltas(current_user, deltas)
+            User.bump_data_version(current_user)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+    return jsonify({'deleted': ids, 'rejected': rejected}), 200
+
+
+# Route to get expense totals and counts per category and per month.
+# Reads the incrementally maintained rollup rows, so the cost doesn't grow with the number of expenses.
+@expense.route('/summary', methods=['GET'])
+@jwt_required()
+def get_expense_summary():
+    current_user = get_jwt_identity().get('id')
+    etag = collection_etag(current_user, 'expenses/summary')
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+
+    rows = ExpenseSummary.query.filter_by(user_id=current_user).order_by(ExpenseSummary.month, ExpenseSummary.category).all()
+
+    by_category = {}
+    by_month = {}
+    for row in rows:
+        for totals, key in ((by_category, row.category), (by_month, row.month)):
+            total, count = totals.get(key, (0, 0))
+            totals[key] = (total + row.total, count + row.count)
+
+    response = jsonify({
+        'total': round(sum(row.total for row in rows), 2),
+        'count': sum(row.count for row in rows),
+        'by_category': [{'category': category, 'total': round(total, 2), 'count': count}
+                        for category, (total, count) in sorted(by_category.items())],
+        'by_month': [{'month': month, 'total': round(total, 2), 'count': count}
+                     for month, (total, count) in sorted(by_month.items())],
+        'by_category_month': [row.to_dict() for row in rows]
+    })
+    response.set_etag(etag)
+    return response
+
 
 @expense.route('/<id>', methods=['DELETE'])
 @jwt_required()
@@ -67,6 +471,11 @@ def delete_expense(id):
     if expense.user_id != current_user:
         return jsonify({'message': 'Unauthorized'}), 403
     db.session.delete(expense)
+    DeletedRecord.record(current_user, 'expense', [expense.id])
+    ExpenseSummary.apply_deltas(current_user, {
+        (expense.category, ExpenseSummary.month_key(expense.date)): (-expense.amount, -1)
+    })
+    User.bump_data_version(current_user)
     db.session.commit()
     return jsonify({'message': 'Expense deleted!'})
 
@@ -79,10 +488,20 @@ def update_expense(id):
     expense = Expense.query.get_or_404(id)
     if expense.user_id != current_user:
         return jsonify({'message': 'Unauthorized'}), 403
+    old_key = (expense.category, ExpenseSummary.month_key(expense.date))
+    old_amount = expense.amount
     expense.amount = data['amount']
     expense.description = data['description']
     expense.category = data['category']
     expense.date = datetime.strptime(data['date'], '%Y-%m-%d')
+
+    # Move the expense between rollup rows (or adjust one row when category and month didn't change):
+    deltas = {old_key: (-old_amount, -1)}
+    new_key = (expense.category, ExpenseSummary.month_key(expense.date))
+    amount, count = deltas.get(new_key, (0, 0))
+    deltas[new_key] = (amount + float(expense.amount), count + 1)
+    ExpenseSummary.apply_deltas(current_user, deltas)
+    User.bump_data_version(current_user)
     db.session.commit()
     return jsonify({'message': 'Expense updated!'})
     # return jsonify(expense.to_dict()), 201
@@ -0,0 +1,106 @@
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from app import db
+from app.models.expense import Expense
+from app.models.packing_list import PackingList
+from app.models.item import Item
+from datetime import date
+import csv
+import io
+import json
+import logging
+
+export = Blueprint('export', __name__, url_prefix='/export')
+
+# Record type written on each NDJSON line, per exportable resource:
+EXPORT_RECORD_TYPES = {'expenses': 'expense', 'packing_lists': 'packing_list', 'items': 'item'}
+
+
+# Column-only queries (no ORM objects, no identity map) for each resource the user owns, in id order:
+def export_queries(current_user):
+    return {
+        'expenses': select(Expense.id, Expense.amount, Expense.description, Expense.date, Expense.category)
+        .where(Expense.user_id == current_user).order_by(Expense.id),
+        'packing_lists': select(PackingList.id, PackingList.listName, PackingList.dateSaved)
+        .where(PackingList.user_id == current_user).order_by(PackingList.id),
+        'items': select(Item.id, Item.listId, Item.description, Item.quantity, Item.packed)
+        .join(PackingList, Item.listId == PackingList.id)
+        .where(PackingList.user_id == current_user).order_by(Item.id)
+    }
+
+
+# Dates are exported like the API returns them (YYYY-MM-DD):
+def export_value(value):
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+# Rows of a query in batches of EXPORT_YIELD_PER. yield_per streams from a server-side cursor on
+# PostgreSQL, so only one batch is held in memory at a time.
+def stream_rows(query):
+    result = db.session.execute(query.execution_options(yield_per=current_app.config['EXPORT_YIELD_PER']))
+    for partition in result.partitions():
+        yield [{key: export_value(value) for key, value in row._mapping.items()} for row in partition]
+
+
+def ndjson_export(queries):
+    for resource, query in queries.items():
+        record_type = EXPORT_RECORD_TYPES[resource]
+        for rows in stream_rows(query):
+            yield ''.join(json.dumps({'type': record_type, **row}) + '\n' for row in rows)
+
+
+def csv_export(query):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=[column.key for column in query.selected_columns])
+    writer.writeheader()
+    # Send the header straight away, then one chunk per batch of rows:
+    yield buffer.getvalue()
+    for rows in stream_rows(query):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+# Route to export everything the user owns. NDJSON (default) includes expenses, packing lists and items,
+# one record per line tagged with its "type"; CSV exports one ?resource= at a time.
+# Rows are serialized as they are read, so memory stays flat and the download starts immediately.
+@export.route('', methods=['GET'])
+@jwt_required()
+def export_account():
+    current_user = get_jwt_identity().get('id')
+    queries = export_queries(current_user)
+
+    file_format = request.args.get('format', 'ndjson')
+    if file_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+
+    resource = request.args.get('resource')
+    if resource is not None and resource not in queries:
+        return jsonify({'message': f"resource must be one of {', '.join(queries)}"}), 400
+    if resource is None and file_format == 'csv':
+        return jsonify({'message': 'CSV exports need ?resource=' + '|'.join(queries)}), 400
+    if resource is not None:
+        queries = {resource: queries[resource]}
+
+    if file_format == 'csv':
+        chunks, mimetype = csv_export(queries[resource]), 'text/csv'
+    else:
+        chunks, mimetype = ndjson_export(queries), 'application/x-ndjson'
+
+    def generate():
+        try:
+            yield from chunks
+        except Exception:
+            # Headers are already sent, so all we can do is cut the download short:
+            logging.exception(f'Export failed for user {current_user}')
+            raise
+        finally:
+            db.session.rollback()
+
+    filename = f"export-{resource or 'account'}.{'csv' if file_format == 'csv' else 'ndjson'}"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
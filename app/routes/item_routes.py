@@ -1,12 +1,49 @@
 from app import db
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import contains_eager
 from app.models.packing_list import PackingList
 from app.models.item import Item
+from app.models.user import User
+from app.models.deleted_record import DeletedRecord
 
 # Defines new flask blueprint:
 item_bp = Blueprint('item', __name__, url_prefix='/packing-list/<int:listId>/items')
 
+# Load an item together with its packing list in one joined SELECT, so checking the owner
+# doesn't lazy-load item.packing_list. Returns (item, owned); aborts with 404 if there's no such item.
+def find_item(current_user, listId, id):
+    item = Item.query.join(Item.packing_list).options(contains_eager(Item.packing_list)) \
+        .filter(Item.id == id, Item.listId == listId).first()
+    if item is None:
+        abort(404)
+    return item, item.packing_list.user_id == current_user
+
+
+# Clients opt into lean responses with `Prefer: return=minimal` or ?response=delta:
+def wants_delta():
+    return request.args.get('response') == 'delta' or 'return=minimal' in request.headers.get('Prefer', '')
+
+
+# The change just made to a list, with its new item/packed counts and the user's new data version
+# (the one its ETags derive from), all from one query. Run it before committing, inside the transaction.
+def list_delta(current_user, listId, **changes):
+    item_count, packed_count, version = db.session.query(
+        func.count(Item.id),
+        func.coalesce(func.sum(case((Item.packed, 1), else_=0)), 0),
+        select(User.data_version).where(User.id == current_user).scalar_subquery()
+    ).filter(Item.listId == listId).one()
+    return {**changes, 'listId': listId, 'version': version, 'itemCount': item_count, 'packedCount': packed_count}
+
+
+def delta_response(message, delta):
+    response = jsonify({'message': message, **delta})
+    if 'return=minimal' in request.headers.get('Prefer', ''):
+        response.headers['Preference-Applied'] = 'return=minimal'
+    return response, 200
+
+
 # Route to Add new item to packing list:
 @item_bp.route('', methods=['POST'])
 @jwt_required()
@@ -31,6 +68,7 @@ def add_item_to_list(listId):
             listId=packing_list.id
         )
         db.session.add(new_item)
+        User.bump_data_version(current_user)
         db.session.commit()
 
         return jsonify({'message': 'Item added to list', 'item': new_item.to_dict()}), 201
@@ -39,19 +77,25 @@ def add_item_to_list(listId):
         return jsonify({'message': str(e)}), 500
 
 
-# Route to Delete a specific item:
+# Route to Delete a specific item (returns the whole list, or just the change with wants_delta()):
 @item_bp.route('/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_item(listId, id):
     current_user = get_jwt_identity().get('id')
-    item = Item.query.filter_by(id=id, listId=listId).first_or_404()
+    item, owned = find_item(current_user, listId, id)
 
     # Check if the item belongs to the current user:
-    if item.packing_list.user_id != current_user:
+    if not owned:
         return jsonify({'message': 'Unauthorized'}), 403
     
     try: 
         db.session.delete(item)
+        DeletedRecord.record(current_user, 'item', [id])
+        User.bump_data_version(current_user)
+        if wants_delta():
+            delta = list_delta(current_user, listId, deleted=[id])
+            db.session.commit()
+            return delta_response('Item deleted', delta)
         db.session.commit()
 
         # get the updated list without the removed item:
@@ -68,15 +112,18 @@ def delete_item(listId, id):
 @jwt_required()
 def toggle_packed_status(listId, id):
     current_user = get_jwt_identity().get('id')
-    item = Item.query.filter_by(id=id, listId=listId).first_or_404()
+    item, owned = find_item(current_user, listId, id)
 
-    if item.packing_list.user_id != current_user:
+    if not owned:
         return jsonify({'message': 'Unauthorized'}), 403
     
     try:
         item.packed = not item.packed
+        User.bump_data_version(current_user)
+        # Serialize before committing; afterwards the expired item would be reloaded with another SELECT:
+        response_data = item.to_dict()
         db.session.commit()
-        return jsonify({'message': 'Item status toggled', 'item': item.to_dict()})
+        return jsonify({'message': 'Item status toggled', 'item': response_data})
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
@@ -87,10 +134,10 @@ def toggle_packed_status(listId, id):
 @jwt_required()
 def update_item(listId, id):
     current_user = get_jwt_identity().get ('id')
-    item = Item.query.filter_by(id=id, listId=listId).first_or_404()
+    item, owned = find_item(current_user, listId, id)
 
     # Check if the item belongs to the current user:
-    if item.packing_list.user_id != current_user:
+    if not owned:
         return jsonify({'mesage': 'Unauthorized'}), 403
     
     data = request.get_json()
@@ -103,6 +150,7 @@ def update_item(listId, id):
         item.quantity = quantity
 
     try:
+        User.bump_data_version(current_user)
         db.session.commit()
         return jsonify({'message': 'Item updated', 'item': item.to_dict()}), 200
     except Exception as e:
@@ -110,7 +158,7 @@ def update_item(listId, id):
         return jsonify({'message': 'Error updating item', 'error': str(e)}), 500
     
 
-# Delete all items in a list:
+# Delete all items in a list (returns the emptied list, or just the change with wants_delta()):
 @item_bp.route('', methods=['DELETE'])
 @jwt_required()
 def delete_all_items(listId):
@@ -118,7 +166,13 @@ def delete_all_items(listId):
     packing_list = PackingList.query.filter_by(id=listId, user_id=current_user).first_or_404()
 
     try:
-        Item.query.filter_by(listId=listId).delete()
+        deleted = db.session.execute(delete(Item).where(Item.listId == listId).returning(Item.id)).scalars().all()
+        DeletedRecord.record(current_user, 'item', deleted)
+        User.bump_data_version(current_user)
+        if wants_delta():
+            delta = list_delta(current_user, listId, deleted=deleted)
+            db.session.commit()
+            return delta_response('All items deleted from list', delta)
         db.session.commit()
 
         return jsonify({'message': 'All items deleted from list', 'packing_list': packing_list.to_dict()}), 200
@@ -126,3 +180,108 @@ def delete_all_items(listId):
         db.session.rollback()
         return jsonify({'message': 'Error deleting items', 'error': str(e)}), 500
     
+
+
+# Fold a batch of item operations, in order, into the net change to the list: which items to add,
+# which columns to update per existing item and which items to delete. `current` maps the list's item
+# ids to their packed flag. Invalid operations get an error result and are otherwise skipped.
+# Returns (adds as [(index, values)], updates by id, deleted ids, results with None for the adds).
+def fold_item_operations(current, operations):
+    packed = dict(current)
+    adds = []
+    updates = {}
+    deleted = set()
+    results = []
+
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        item_id = operation.get('id') if isinstance(operation, dict) else None
+        try:
+            if op == 'add':
+                adds.append((index, Item.parse_fields(operation, new=True)))
+                results.append(None)
+                continue
+            if op not in ('toggle', 'set_packed', 'update', 'delete'):
+                raise ValueError(f'Unknown op: {op}')
+            if not isinstance(item_id, int) or isinstance(item_id, bool):
+                raise ValueError('id must be an integer')
+            if item_id not in packed or item_id in deleted:
+                raise ValueError(f'Item {item_id} not found in this list')
+
+            if op == 'delete':
+                deleted.add(item_id)
+                updates.pop(item_id, None)
+                results.append({'op': op, 'id': item_id, 'status': 'ok'})
+                continue
+
+            if op == 'toggle':
+                values = {'packed': not packed[item_id]}
+            elif op == 'set_packed':
+                values = Item.parse_fields({'packed': operation.get('packed')})
+                if not values:
+                    raise ValueError('packed must be true or false')
+            else:
+                values = Item.parse_fields({key: operation[key] for key in ('description', 'quantity') if key in operation})
+                if not values:
+                    raise ValueError('Nothing to update')
+
+            packed[item_id] = values.get('packed', packed[item_id])
+            updates.setdefault(item_id, {}).update(values)
+            results.append({'op': op, 'id': item_id, 'status': 'ok', **values})
+        except ValueError as e:
+            results.append({'op': op, 'id': item_id, 'status': 'error', 'message': str(e)})
+
+    # Items deleted later in the batch need no update:
+    updates = {id: values for id, values in updates.items() if id not in deleted}
+    return adds, updates, deleted, results
+
+
+# Route to apply many item operations in one request and one transaction, e.g. a burst of taps while packing:
+# {"operations": [{"op": "toggle", "id": 1}, {"op": "set_packed", "id": 2, "packed": true},
+#                 {"op": "update", "id": 3, "quantity": 2}, {"op": "delete", "id": 4},
+#                 {"op": "add", "description": "Socks", "quantity": 2}]}
+# Operations are folded into their net effect first and written with at most one DELETE, one bulk
+# UPDATE and one bulk INSERT. Returns a result per operation plus the list's new counts and version.
+@item_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_item_operations(listId):
+    current_user = get_jwt_identity().get('id')
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    max_operations = current_app.config['ITEMS_BATCH_MAX_OPERATIONS']
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'message': 'operations must be a non-empty list'}), 400
+    if len(operations) > max_operations:
+        return jsonify({'message': f'At most {max_operations} operations per request'}), 400
+
+    # Lock the list so concurrent batches on it apply one after the other:
+    PackingList.query.filter_by(id=listId, user_id=current_user).with_for_update().first_or_404()
+
+    try:
+        current = dict(db.session.execute(select(Item.id, Item.packed).where(Item.listId == listId)).all())
+        adds, updates, deleted, results = fold_item_operations(current, operations)
+
+        if deleted:
+            db.session.execute(delete(Item).where(Item.listId == listId, Item.id.in_(deleted)),
+                               execution_options={'synchronize_session': False})
+            DeletedRecord.record(current_user, 'item', deleted)
+        if updates:
+            # ORM bulk UPDATE by primary key; ids were checked against this list above:
+            db.session.execute(update(Item), [{'id': id, **values} for id, values in updates.items()])
+        if adds:
+            new_ids = db.session.scalars(
+                insert(Item).returning(Item.id, sort_by_parameter_order=True),
+                [{**values, 'listId': listId} for _, values in adds]
+            ).all()
+            for (index, values), new_id in zip(adds, new_ids):
+                results[index] = {'op': 'add', 'id': new_id, 'status': 'ok', **values}
+
+        if adds or updates or deleted:
+            User.bump_data_version(current_user)
+        delta = list_delta(current_user, listId, results=results)
+        db.session.commit()
+        return jsonify(delta), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error applying item operations', 'error': str(e)}), 500
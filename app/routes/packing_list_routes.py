@@ -1,8 +1,13 @@
 from app import db
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import case, delete, false, func, insert, literal, select, update
+from sqlalchemy.orm import selectinload
 from app.models.packing_list import PackingList
 from app.models.item import Item
+from app.models.user import User
+from app.models.deleted_record import DeletedRecord
+from app.services.etag import collection_etag, not_modified
 
 # Defines new flask blueprint:
 packing_list_bp = Blueprint('packing_list', __name__, url_prefix='/packing-list')
@@ -14,13 +19,16 @@ def create_list():
     data = request.get_json()
     list_name = data.get('listName')
     items_data = data.get('items', [])
+    is_template = data.get('isTemplate', False)
 
     if not list_name:
         return jsonify({'message': 'List name is required'}), 400
+    if not isinstance(is_template, bool):
+        return jsonify({'message': 'isTemplate must be true or false'}), 400
     
     try:
         current_user = get_jwt_identity().get('id')
-        new_list = PackingList(listName=list_name, user_id=current_user)
+        new_list = PackingList(listName=list_name, user_id=current_user, is_template=is_template)
         
         db.session.add(new_list)
         db.session.flush()  # Use flush to get the id for the new list
@@ -36,6 +44,7 @@ def create_list():
             for item in items_data
         ]
         db.session.add_all(items)
+        User.bump_data_version(current_user)
         db.session.commit()
 
         response_data = new_list.to_dict()
@@ -46,19 +55,51 @@ def create_list():
         return jsonify({'message': str(e)}), 500
 
 
-# Route to Get all Lists:
+# Item and packed counts per list from one aggregate query (no item rows are loaded):
+def list_summaries(current_user, *filters):
+    rows = db.session.query(
+        PackingList.id, PackingList.listName, PackingList.dateSaved, PackingList.is_template,
+        func.count(Item.id), func.coalesce(func.sum(case((Item.packed, 1), else_=0)), 0)
+    ).outerjoin(Item, Item.listId == PackingList.id) \
+        .filter(PackingList.user_id == current_user, *filters) \
+        .group_by(PackingList.id, PackingList.listName, PackingList.dateSaved, PackingList.is_template) \
+        .order_by(PackingList.id)
+    return [{
+        'id': id,
+        'listName': list_name,
+        'dateSaved': date_saved.strftime('%Y-%m-%d'),
+        'isTemplate': is_template,
+        'itemCount': item_count,
+        'packedCount': packed_count
+    } for id, list_name, date_saved, is_template, item_count, packed_count in rows]
+
+
+# Route to Get all Lists (with an ETag; If-None-Match gets a 304 until any of the user's lists change).
+# ?view=summary returns item/packed counts per list instead of the items themselves.
 @packing_list_bp.route('', methods=['GET'])
 @jwt_required()
 def get_lists():
     current_user = get_jwt_identity().get('id')
-    lists = PackingList.query.filter_by(user_id=current_user).all()
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        return jsonify({'message': 'view must be full or summary'}), 400
 
-    if not lists:
-        return jsonify([]), 200
-    
-    response_data = [packing_list.to_dict() for packing_list in lists]
-    
-    return jsonify(response_data), 200
+    etag = collection_etag(current_user, 'packing-list', view)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+
+    if view == 'summary':
+        response_data = list_summaries(current_user)
+    else:
+        # Load every list's items with one extra SELECT ... WHERE listId IN (...), not one query per list:
+        lists = PackingList.query.options(selectinload(PackingList.items)) \
+            .filter_by(user_id=current_user).order_by(PackingList.id).all()
+        response_data = [packing_list.to_dict() for packing_list in lists]
+
+    response = jsonify(response_data)
+    response.set_etag(etag)
+    return response, 200
 
 
 # Route to Delete a list:
@@ -73,6 +114,9 @@ def delete_list(id):
     
     try:
         db.session.delete(packing_list)
+        # The list's tombstone covers its items too:
+        DeletedRecord.record(current_user, 'packing_list', [packing_list.id])
+        User.bump_data_version(current_user)
         db.session.commit()
         return jsonify({'message': 'Packing list deleted!'}), 200
     except Exception as e:
@@ -80,56 +124,159 @@ def delete_list(id):
         return jsonify({'message': str(e)}), 500
 
 
-# Route to Update the items in a list:
+# Work out how to turn the list's current items into the requested set: items with an id are updated,
+# items without one are added, and current items left out are deleted. Raises ValueError.
+def diff_items(current_ids, items_data):
+    if not isinstance(items_data, list) or not all(isinstance(item_data, dict) for item_data in items_data):
+        raise ValueError('items must be a list of objects')
+
+    inserts = []
+    updates = []
+    kept = set()
+    for item_data in items_data:
+        item_id = item_data.get('id')
+        if item_id is None:
+            inserts.append(Item.parse_fields(item_data, new=True))
+            continue
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            raise ValueError('Item ids must be integers')
+        if item_id not in current_ids or item_id in kept:
+            raise ValueError(f'Item {item_id} is not in this list, or appears more than once')
+        kept.add(item_id)
+        values = Item.parse_fields(item_data)
+        if values:
+            updates.append({'id': item_id, **values})
+    return inserts, updates, current_ids - kept
+
+
+# Route to Update a list. "items", when present, is the complete item set the list should end up with:
+# the difference from the current items is applied with one INSERT, one UPDATE and one DELETE (each
+# an executemany or set-based statement), in one transaction. Without "items" only the name changes.
 @packing_list_bp.route('/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_list(id):
     current_user = get_jwt_identity().get('id')
     data = request.get_json()
-    packing_list = PackingList.query.filter_by(id=id, user_id=current_user).first_or_404()
+    # Lock the list so concurrent updates of it apply one after the other:
+    packing_list = PackingList.query.filter_by(id=id, user_id=current_user).with_for_update().first_or_404()
 
     list_name = data.get('listName')
-    items_data = data.get('items', [])
+    items_data = data.get('items')
+    is_template = data.get('isTemplate')
 
     # Update list name if provided:
     if list_name is not None:
         packing_list.listName = list_name
+    if is_template is not None:
+        if not isinstance(is_template, bool):
+            db.session.rollback()
+            return jsonify({'message': 'isTemplate must be true or false'}), 400
+        packing_list.is_template = is_template
+
+    inserts, updates, deletes = [], [], set()
+    if items_data is not None:
+        current_ids = set(db.session.execute(select(Item.id).where(Item.listId == id)).scalars())
+        try:
+            inserts, updates, deletes = diff_items(current_ids, items_data)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'message': str(e)}), 400
 
     try:
-        # Add new items from the request:
-        for item_data in items_data:
-            item_id = item_data.get('id')
-            description = item_data.get('description')
-            quantity = item_data.get('quantity')
-            packed = item_data.get('packed')
-
-            if item_id is None:
-                # Add new item:
-                new_item = Item(
-                    description=description,
-                    quantity=quantity,
-                    packed=packed,
-                    listId=packing_list.id
-                )
-                db.session.add(new_item)
-        
+        if deletes:
+            db.session.execute(delete(Item).where(Item.listId == id, Item.id.in_(deletes)),
+                               execution_options={'synchronize_session': False})
+            DeletedRecord.record(current_user, 'item', deletes)
+        if updates:
+            # ORM bulk UPDATE by primary key; ids were checked against this list above:
+            db.session.execute(update(Item), updates)
+        if inserts:
+            db.session.execute(insert(Item), [{**values, 'listId': id} for values in inserts])
+
+        User.bump_data_version(current_user)
         db.session.commit()
-        updated_packing_list = PackingList.query.get(id)
+        updated_packing_list = PackingList.query.options(selectinload(PackingList.items)).filter_by(id=id).one()
         return jsonify({'message': 'Packing list updated', 'packing_list': updated_packing_list.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Error updating itme'}), 500
 
 
+# Route to Get the user's templates, with item counts:
+@packing_list_bp.route('/templates', methods=['GET'])
+@jwt_required()
+def get_templates():
+    current_user = get_jwt_identity().get('id')
+    etag = collection_etag(current_user, 'packing-list/templates')
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+
+    response = jsonify(list_summaries(current_user, PackingList.is_template.is_(True)))
+    response.set_etag(etag)
+    return response, 200
+
+
+# Route to Clone a list or instantiate a template: {"listName": "...", "isTemplate": false} (both optional).
+# Items are copied by one INSERT ... SELECT inside the database, unpacked, so the cost doesn't depend on
+# how many items the list has. Returns the new list without its items (see itemCount).
+@packing_list_bp.route('/<int:id>/clone', methods=['POST'])
+@jwt_required()
+def clone_list(id):
+    current_user = get_jwt_identity().get('id')
+    data = request.get_json(silent=True) or {}
+    source = PackingList.query.filter_by(id=id, user_id=current_user).first()
+
+    if source is None:
+        return jsonify({'message': 'Packing list not found'}), 404
+
+    list_name = data.get('listName') or source.listName
+    is_template = data.get('isTemplate', False)
+    if not isinstance(is_template, bool):
+        return jsonify({'message': 'isTemplate must be true or false'}), 400
+
+    try:
+        new_list = PackingList(listName=list_name, user_id=current_user, is_template=is_template)
+        db.session.add(new_list)
+        db.session.flush()  # Use flush to get the id for the new list
+
+        copied = db.session.execute(insert(Item).from_select(
+            ['description', 'quantity', 'packed', 'listId'],
+            select(Item.description, Item.quantity, false(), literal(new_list.id)).where(Item.listId == id).order_by(Item.id)
+        )).rowcount
+        User.bump_data_version(current_user)
+
+        response_data = {
+            'id': new_list.id,
+            'listName': new_list.listName,
+            'userId': new_list.user_id,
+            'dateSaved': new_list.dateSaved.strftime('%Y-%m-%d'),
+            'isTemplate': new_list.is_template,
+            'itemCount': copied
+        }
+        db.session.commit()
+        return jsonify({'message': 'Packing list cloned', 'packingList': response_data}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+
 # Route to Get a packing list by ID:
 @packing_list_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 def get_list_by_id(id):
     current_user = get_jwt_identity().get('id')
+    etag = collection_etag(current_user, f'packing-list/{id}')
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+
     packing_list = PackingList.query.filter_by(id=id, user_id=current_user).first()
     
     if packing_list is None:
         return jsonify({'message': 'Packing list not found'}), 404
     
-    return jsonify(packing_list.to_dict()), 200
+    response = jsonify(packing_list.to_dict())
+    response.set_etag(etag)
+    return response, 200
         
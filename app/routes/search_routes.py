@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services.search import search
+
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+# ?types= names for the searchable resources:
+SEARCH_TYPES = {'items': 'item', 'lists': 'packing_list', 'expenses': 'expense'}
+
+
+# Route to search the user's packing list items, list names and expense descriptions:
+# GET /search?q=passport adapter[&types=items,lists,expenses][&limit=20][&offset=0]
+# Hits are ranked by relevance; pass nextOffset back as ?offset= for the next page.
+@search_bp.route('', methods=['GET'])
+@jwt_required()
+def search_everything():
+    current_user = get_jwt_identity().get('id')
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'message': 'q is required'}), 400
+
+    types = [name.strip() for name in request.args.get('types', ','.join(SEARCH_TYPES)).split(',') if name.strip()]
+    if not types or any(name not in SEARCH_TYPES for name in types):
+        return jsonify({'message': f"types must be a comma separated list of {', '.join(SEARCH_TYPES)}"}), 400
+
+    try:
+        limit = int(request.args.get('limit', current_app.config['SEARCH_PAGE_SIZE']))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'message': 'limit and offset must be integers'}), 400
+    if not 1 <= limit <= current_app.config['SEARCH_MAX_PAGE_SIZE']:
+        return jsonify({'message': f"limit must be between 1 and {current_app.config['SEARCH_MAX_PAGE_SIZE']}"}), 400
+    # Bounded, so the OFFSET always fits the database's integer type (and deep pages stay cheap):
+    if not 0 <= offset <= current_app.config['SEARCH_MAX_OFFSET']:
+        return jsonify({'message': f"offset must be between 0 and {current_app.config['SEARCH_MAX_OFFSET']}"}), 400
+
+    hits, has_more = search(current_user, q, {SEARCH_TYPES[name] for name in types}, limit, offset)
+    return jsonify({'results': hits, 'nextOffset': offset + limit if has_more else None}), 200
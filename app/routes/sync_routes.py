@@ -0,0 +1,71 @@
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.models.expense import Expense
+from app.models.packing_list import PackingList
+from app.models.item import Item
+from app.models.deleted_record import DeletedRecord
+from datetime import datetime, timedelta
+import base64
+
+sync = Blueprint('sync', __name__, url_prefix='/sync')
+
+
+# Opaque sync cursor: the server time at which the previous sync started.
+def encode_sync_cursor(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+# Raises ValueError unless it decodes to a naive (UTC) time, like the cursors encode_sync_cursor returns.
+def decode_sync_cursor(cursor):
+    moment = datetime.fromisoformat(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if moment.tzinfo is not None:
+        raise ValueError('Sync cursors carry no time zone')
+    return moment
+
+
+# Route for offline clients to catch up: GET /sync returns everything, GET /sync?since=<cursor> only the
+# expenses, packing lists and items changed since the cursor, plus the ids deleted since then. Pass the
+# returned cursor next time. Apply "deleted" before the changed rows; changes right around the cursor may
+# be sent twice (see SYNC_OVERLAP_SECONDS), so apply them as upserts.
+@sync.route('', methods=['GET'])
+@jwt_required()
+def get_changes():
+    current_user = get_jwt_identity().get('id')
+    started = datetime.utcnow()
+
+    since = None
+    if request.args.get('since'):
+        try:
+            since = decode_sync_cursor(request.args['since'])
+        except ValueError:
+            return jsonify({'message': 'Invalid sync cursor'}), 400
+        # Tombstones older than the retention period are pruned, so deletions could be missed:
+        if since < started - timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS']):
+            return jsonify({'message': 'Sync cursor expired, sync again without since'}), 410
+
+    expenses = Expense.query.filter(Expense.user_id == current_user)
+    packing_lists = PackingList.query.filter(PackingList.user_id == current_user)
+    items = Item.query.join(PackingList, Item.listId == PackingList.id).filter(PackingList.user_id == current_user)
+    deleted = {'expense': [], 'packing_list': [], 'item': []}
+
+    if since is not None:
+        # Rows are stamped before their transaction commits, so look back a little to catch
+        # changes that were still in flight when the previous sync ran:
+        window = since - timedelta(seconds=current_app.config['SYNC_OVERLAP_SECONDS'])
+        expenses = expenses.filter(Expense.updated_at > window)
+        packing_lists = packing_lists.filter(PackingList.updated_at > window)
+        items = items.filter(Item.updated_at > window)
+        tombstones = db.session.query(DeletedRecord.resource, DeletedRecord.record_id) \
+            .filter(DeletedRecord.user_id == current_user, DeletedRecord.deleted_at > window)
+        for resource, record_id in tombstones:
+            deleted[resource].append(record_id)
+
+    return jsonify({
+        'cursor': encode_sync_cursor(started),
+        'full': since is None,
+        'expenses': [expense.to_dict() for expense in expenses.order_by(Expense.id)],
+        'packingLists': [packing_list.to_dict(include_items=False) for packing_list in packing_lists.order_by(PackingList.id)],
+        'items': [item.to_dict() for item in items.order_by(Item.id)],
+        'deleted': {'expenses': deleted['expense'], 'packingLists': deleted['packing_list'], 'items': deleted['item']}
+    }), 200
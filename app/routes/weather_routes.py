@@ -1,12 +1,94 @@
-from flask import Blueprint, jsonify, request
-from app import db
-from dotenv import load_dotenv
+from flask import Blueprint, jsonify, request, current_app
+from app import db, forecast_cache, outbound
+from app.models.city_location import CityLocation
+from app.services.errors import UpstreamError
+from app.services.forecast import summarize_forecast, project, DAY_FIELDS
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import os
-import requests
+from sqlalchemy.exc import IntegrityError
+from gevent.pool import Pool
+import logging
 
 weather = Blueprint('weather', __name__, url_prefix="")
 
+
+# Resolve a normalized (city, country) to coordinates: local table first, OpenWeather geocoding on a miss.
+def resolve_coordinates(city, country):
+    location = CityLocation.lookup(city, country)
+    if location is not None:
+        return location.lat, location.lon
+
+    # Construct the query with optional country
+    query = f"{city},{country}" if country else city
+    openweather_api_key = current_app.config['OPENWEATHER_API_KEY']
+
+    geocoding_url = 'http://api.openweathermap.org/geo/1.0/direct'
+    geocoding_response = outbound.get('openweather', geocoding_url, params={'q': query, 'limit': 1, 'appid': openweather_api_key})
+
+    if geocoding_response.status_code != 200:
+        raise UpstreamError('Failed to fetch city coordinates', geocoding_response.status_code)
+
+    matches = geocoding_response.json()
+    if not matches:
+        raise UpstreamError('City not found', 404)
+
+    lat = matches[0]['lat']
+    lon = matches[0]['lon']
+
+    # Write the result back so the next lookup for this destination stays local:
+    try:
+        db.session.add(CityLocation(city=city, country=country, lat=lat, lon=lon))
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored the same city first - that's fine.
+        db.session.rollback()
+        logging.debug(f'City location for {city},{country} already stored')
+
+    return lat, lon
+
+
+# Fetch the forecast from OpenWeather. Raises UpstreamError on failure so errors are never cached.
+def fetch_forecast(city, country):
+    lat, lon = resolve_coordinates(city, country)
+    openweather_api_key = current_app.config['OPENWEATHER_API_KEY']
+
+    forecast_url = 'http://api.openweathermap.org/data/2.5/forecast'
+    forecast_response = outbound.get(
+        'openweather',
+        forecast_url,
+        params={'lat': lat, 'lon': lon, 'appid': openweather_api_key, 'units': 'metric'}
+    )
+
+    if forecast_response.status_code != 200:
+        raise UpstreamError('Error fetching weather data', forecast_response.status_code)
+
+    return forecast_response.json()
+
+
+# Parse the optional response shaping arguments shared by /weather and /weather/batch:
+# - view=compact: one aggregated record per local day instead of 40 raw 3-hour slots
+# - fields=a,b: keep only these keys (of each day in compact view, of the top-level response otherwise)
+# Returns (view, fields, error message).
+def parse_view_args(args):
+    view = args.get('view', 'full')
+    fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()]
+
+    if view not in ('full', 'compact'):
+        return view, fields, 'view must be "full" or "compact"'
+    if view == 'compact' and any(field not in DAY_FIELDS for field in fields):
+        return view, fields, f'fields must be chosen from: {", ".join(DAY_FIELDS)}'
+    return view, fields, None
+
+
+def shape_forecast(forecast_data, view, fields):
+    if view == 'compact':
+        forecast_data = summarize_forecast(forecast_data)
+        if fields:
+            forecast_data['days'] = [project(day, fields) for day in forecast_data['days']]
+    elif fields:
+        forecast_data = project(forecast_data, fields)
+    return forecast_data
+
+
 @weather.route("/weather", methods=['GET'])
 @jwt_required()
 def get_weather():
@@ -15,28 +97,84 @@ def get_weather():
     if not city:
         return jsonify({'error': 'City is required'}), 400
 
-    # Construct the query with optional country
-    query = f"{city},{country}" if country else city
-    
-    openweather_api_key = os.environ.get('OPENWEATHER_API_KEY') 
+    view, fields, error = parse_view_args(request.args)
+    if error:
+        return jsonify({'error': error}), 400
 
+    # Normalized query is both the cache key and the geocoding table key:
+    key = CityLocation.normalize(city, country)
 
-    geocoding_url = f'http://api.openweathermap.org/data/2.5/weather?q={query}&appid={openweather_api_key}'
-    geocoding_response = requests.get(geocoding_url)
+    try:
+        forecast_data = forecast_cache.get(key, lambda: fetch_forecast(*key))
+    except UpstreamError as e:
+        return jsonify({'error': e.message}), e.status_code
 
-    if geocoding_response.status_code != 200:
-        return jsonify({'error': 'Failed to fetch city coordinates'}), geocoding_response.status_code
+    return jsonify(shape_forecast(forecast_data, view, fields))
 
-    city_data = geocoding_response.json()
-    lat = city_data['coord']['lat']
-    lon = city_data['coord']['lon']
 
-    forecast_url = f'http://api.openweathermap.org/data/2.5/forecast?q={query}&appid={openweather_api_key}&units=metric'
-    forecast_response = requests.get(forecast_url)
+# Route to get forecasts for several destinations in one call:
+# POST /weather/batch {"destinations": [{"city": "Paris", "country": "FR"}, ...]}
+# Cached destinations are answered immediately; misses are fetched concurrently on a
+# bounded gevent pool. Each destination reports its own forecast or error.
+@weather.route("/weather/batch", methods=['POST'])
+@jwt_required()
+def get_weather_batch():
+    data = request.get_json(silent=True) or {}
+    destinations = data.get('destinations')
 
-    if forecast_response.status_code != 200:
-        return jsonify({'error': 'Error fetching weather data'}), forecast_response.status_code
+    if not isinstance(destinations, list) or not destinations:
+        return jsonify({'error': 'A non-empty list of destinations is required'}), 400
+    if len(destinations) > current_app.config['WEATHER_BATCH_MAX_DESTINATIONS']:
+        return jsonify({'error': f"At most {current_app.config['WEATHER_BATCH_MAX_DESTINATIONS']} destinations per request"}), 400
+    if any(not isinstance(destination, dict) or not destination.get('city') for destination in destinations):
+        return jsonify({'error': 'City is required for every destination'}), 400
+    if any(not isinstance(destination['city'], str) or not isinstance(destination.get('country'), (str, type(None)))
+           for destination in destinations):
+        return jsonify({'error': 'City and country must be text'}), 400
+
+    view, fields, error = parse_view_args(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+
+    keys = [CityLocation.normalize(destination['city'], destination.get('country')) for destination in destinations]
+    forecasts = {}
+    errors = {}
+
+    # Answer cache hits right away, collect the distinct misses:
+    misses = []
+    for key in dict.fromkeys(keys):
+        found, forecast_data = forecast_cache.peek(key, lambda key=key: fetch_forecast(*key))
+        if found:
+            forecasts[key] = forecast_data
+        else:
+            misses.append(key)
+
+    app = current_app._get_current_object()
+
+    def fetch_miss(key):
+        # Each greenlet gets its own app context (and so its own DB session):
+        with app.app_context():
+            try:
+                forecasts[key] = forecast_cache.get(key, lambda: fetch_forecast(*key))
+            except UpstreamError as e:
+                errors[key] = e
+            except Exception:
+                # Anything else (a malformed provider response, a database error) still only fails this destination:
+                logging.exception(f'Forecast fetch failed for {key}')
+                errors[key] = UpstreamError('Failed to fetch forecast', 502)
+
+    if misses:
+        pool = Pool(min(len(misses), current_app.config['WEATHER_BATCH_CONCURRENCY']))
+        pool.map(fetch_miss, misses)
 
-    forecast_data = forecast_response.json()
+    results = []
+    for destination, key in zip(destinations, keys):
+        result = {'city': destination['city'], 'country': destination.get('country')}
+        if key in forecasts:
+            result['forecast'] = shape_forecast(forecasts[key], view, fields)
+        else:
+            result['error'] = errors[key].message
+            result['status'] = errors[key].status_code
+        results.append(result)
 
-    return jsonify(forecast_data)
\ No newline at end of file
+    return jsonify({'results': results, 'failed': len([result for result in results if 'error' in result])})
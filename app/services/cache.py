@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.services.single_flight import SingleFlight
+
+
+# In-process TTL cache with stale-while-revalidate and LRU eviction.
+#
+# - Fresh entries (younger than TTL) are served straight from memory.
+# - Stale entries (older than TTL but within the stale window) are still served,
+#   while a single background refresh reloads them.
+# - Anything older, or missing, is loaded synchronously by the caller. Concurrent misses
+#   for the same key are coalesced, so only one of them calls the loader.
+#
+# Background refreshes use threading.Thread, which gunicorn's gevent worker
+# monkey-patches into a greenlet, so a refresh never blocks the event loop.
+class TTLCache:
+    def __init__(self, config_prefix, ttl=1800, stale_ttl=3600, maxsize=1024):
+        self.config_prefix = config_prefix
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # key -> (value, stored_at)
+        self._refreshing = {}           # key -> background refresh thread
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def init_app(self, app):
+        # Settings are read from e.g. WEATHER_CACHE_TTL, WEATHER_CACHE_STALE_TTL, WEATHER_CACHE_MAXSIZE:
+        self.ttl = app.config.setdefault(f'{self.config_prefix}_TTL', self.ttl)
+        self.stale_ttl = app.config.setdefault(f'{self.config_prefix}_STALE_TTL', self.stale_ttl)
+        self.maxsize = app.config.setdefault(f'{self.config_prefix}_MAXSIZE', self.maxsize)
+        self.clear()
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._reset_stats()
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            # Evict least recently used entries once we're over the size bound:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Return (True, value) for a fresh or stale entry, (False, None) on a miss.
+    # A stale hit schedules a background refresh with `loader`.
+    def peek(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing[key] = self._start_refresh(key, loader)
+                    return True, value
+                # Too old to serve at all:
+                del self._entries[key]
+            self.misses += 1
+        return False, None
+
+    def get(self, key, loader):
+        found, value = self.peek(key, loader)
+        if found:
+            return value
+
+        def load():
+            value = loader()
+            self.set(key, value)
+            return value
+
+        return self._flights.do(key, load)
+
+    def _start_refresh(self, key, loader):
+        app = current_app._get_current_object()
+
+        def refresh():
+            try:
+                with app.app_context():
+                    value = loader()
+                self.set(key, value)
+            except Exception:
+                # Keep serving the stale entry; the next stale hit retries the refresh.
+                logging.exception(f'Background refresh failed for {key}')
+            finally:
+                with self._lock:
+                    self._refreshing.pop(key, None)
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for_refreshes(self, timeout=None):
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refreshing': len(self._refreshing),
+                'coalesced': self._flights.coalesced
+            }
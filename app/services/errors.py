@@ -0,0 +1,14 @@
+# Raised when a third-party API (OpenWeather, Yelp) call fails.
+# Routes catch it and turn it into a JSON error response.
+class UpstreamError(Exception):
+    def __init__(self, message, status_code=502):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+# Raised without calling the provider while its circuit breaker is open.
+class CircuitOpenError(UpstreamError):
+    def __init__(self, provider):
+        super().__init__(f'{provider} is temporarily unavailable', 503)
+        self.provider = provider
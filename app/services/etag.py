@@ -0,0 +1,20 @@
+import hashlib
+from flask import request, make_response
+from app.models.user import User
+
+
+# Strong ETag for one of the user's collections, derived from their data version.
+# `variant` tells apart representations of the same data (e.g. different filters or pages).
+def collection_etag(user_id, resource, variant=''):
+    version = User.data_version_of(user_id)
+    digest = hashlib.sha1(f'{resource}?{variant}'.encode()).hexdigest()[:16]
+    return f'{user_id}-{version}-{digest}'
+
+
+# 304 response if the client already has this version, otherwise None:
+def not_modified(etag):
+    if not request.if_none_match.contains(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
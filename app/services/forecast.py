@@ -0,0 +1,69 @@
+from collections import Counter
+from datetime import datetime, timezone
+
+# Fields available on each day of a compact forecast:
+DAY_FIELDS = ('date', 'temp_min', 'temp_max', 'precipitation', 'pop', 'summary', 'icon')
+
+
+# Aggregate OpenWeather's 3-hour forecast slots into one record per day, in the
+# destination's local time (the forecast's city.timezone is its UTC offset in seconds).
+# Every slot is visited exactly once and folded into its day's running min/max/totals.
+def summarize_forecast(forecast):
+    city = forecast.get('city', {})
+    utc_offset = city.get('timezone', 0)
+    days = {}
+
+    for slot in forecast.get('list', []):
+        local_date = datetime.fromtimestamp(slot['dt'] + utc_offset, tz=timezone.utc).date()
+        day = days.get(local_date)
+        if day is None:
+            day = days[local_date] = {
+                'temp_min': None,
+                'temp_max': None,
+                'precipitation': 0.0,
+                'pop': 0.0,
+                'conditions': Counter()
+            }
+
+        main = slot.get('main', {})
+        temp_min = main.get('temp_min', main.get('temp'))
+        temp_max = main.get('temp_max', main.get('temp'))
+        if temp_min is not None and (day['temp_min'] is None or temp_min < day['temp_min']):
+            day['temp_min'] = temp_min
+        if temp_max is not None and (day['temp_max'] is None or temp_max > day['temp_max']):
+            day['temp_max'] = temp_max
+
+        # Rain and snow volumes are reported in mm for the 3-hour slot:
+        day['precipitation'] += slot.get('rain', {}).get('3h', 0) + slot.get('snow', {}).get('3h', 0)
+        day['pop'] = max(day['pop'], slot.get('pop', 0))
+
+        for condition in slot.get('weather', [])[:1]:
+            day['conditions'][(condition.get('main'), condition.get('icon'))] += 1
+
+    summary = []
+    for local_date, day in days.items():
+        # The day's summary is its most frequent condition:
+        (condition, icon), _ = day['conditions'].most_common(1)[0] if day['conditions'] else ((None, None), 0)
+        summary.append({
+            'date': local_date.isoformat(),
+            'temp_min': day['temp_min'],
+            'temp_max': day['temp_max'],
+            'precipitation': round(day['precipitation'], 2),
+            'pop': day['pop'],
+            'summary': condition,
+            'icon': icon
+        })
+
+    return {
+        'city': {
+            'name': city.get('name'),
+            'country': city.get('country'),
+            'timezone': utc_offset
+        },
+        'days': summary
+    }
+
+
+# Keep only the requested keys of a record:
+def project(record, fields):
+    return {field: record[field] for field in fields if field in record}
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.services.errors import UpstreamError, CircuitOpenError
+
+
+# Per-provider circuit breaker.
+# After `failure_threshold` consecutive failures the circuit opens and calls fail fast
+# for `reset_timeout` seconds. Then one trial call is let through (half-open):
+# success closes the circuit again, failure re-opens it.
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            if self.state == self.HALF_OPEN:
+                # A trial call is already in flight:
+                self.rejected += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'rejected': self.rejected
+            }
+
+
+# Shared outbound HTTP client for third-party APIs (OpenWeather, Yelp).
+# Each provider gets its own keep-alive Session and connection pool, connect/read timeouts,
+# bounded retries with jittered backoff, and a circuit breaker.
+class OutboundClient:
+    # Upstream statuses worth retrying (rate limited or transient server errors):
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self):
+        self._sessions = {}
+        self._timeouts = {}
+        self._breakers = {}
+        self.stats_log_interval = None
+        self._stats_logged_at = time.monotonic()
+
+    def init_app(self, app):
+        self.close()
+        self.stats_log_interval = app.config['OUTBOUND_STATS_LOG_INTERVAL']
+        for provider in app.config['OUTBOUND_PROVIDERS']:
+            prefix = provider.upper()
+            self.register(
+                provider,
+                connect_timeout=app.config.get(f'{prefix}_CONNECT_TIMEOUT', 3.05),
+                read_timeout=app.config.get(f'{prefix}_READ_TIMEOUT', 10),
+                retries=app.config['OUTBOUND_RETRIES'],
+                backoff_factor=app.config['OUTBOUND_BACKOFF_FACTOR'],
+                pool_maxsize=app.config['OUTBOUND_POOL_MAXSIZE'],
+                failure_threshold=app.config['OUTBOUND_BREAKER_FAILURES'],
+                reset_timeout=app.config['OUTBOUND_BREAKER_RESET_TIMEOUT']
+            )
+
+    def register(self, provider, connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff_factor=0.3, pool_maxsize=10, failure_threshold=5, reset_timeout=30):
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        self._sessions[provider] = session
+        self._timeouts[provider] = (connect_timeout, read_timeout)
+        self._breakers[provider] = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def get(self, provider, url, **kwargs):
+        breaker = self._breakers[provider]
+        if not breaker.allow():
+            raise CircuitOpenError(provider)
+
+        try:
+            response = self._sessions[provider].get(url, timeout=self._timeouts[provider], **kwargs)
+        except requests.Timeout:
+            breaker.record_failure()
+            logging.error(f'{provider} request timed out: {url}')
+            raise UpstreamError(f'{provider} request timed out', 504)
+        except requests.RequestException as e:
+            breaker.record_failure()
+            logging.error(f'{provider} request failed: {e}')
+            raise UpstreamError(f'{provider} request failed', 502)
+        except BaseException:
+            # Anything else (a bug, GreenletExit, gevent.Timeout) must still settle a half-open trial call:
+            breaker.record_failure()
+            raise
+        finally:
+            self._log_stats_periodically()
+
+        # Client errors (bad city, bad key) don't mean the provider is down:
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def stats(self):
+        stats = {}
+        for provider, session in self._sessions.items():
+            pools = []
+            poolmanager = session.get_adapter('https://').poolmanager
+            for pool_key in poolmanager.pools.keys():
+                pool = poolmanager.pools[pool_key]
+                pools.append({
+                    'host': pool.host,
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle_connections': pool.pool.qsize() if pool.pool else 0
+                })
+            stats[provider] = {'breaker': self._breakers[provider].stats(), 'pools': pools}
+        return stats
+
+    # Log pool and breaker stats at most every `stats_log_interval` seconds (per process), on the
+    # next outbound call. Disabled when the interval is 0.
+    def _log_stats_periodically(self):
+        if not self.stats_log_interval or time.monotonic() - self._stats_logged_at < self.stats_log_interval:
+            return
+        self._stats_logged_at = time.monotonic()
+        logging.info(f'Outbound HTTP stats: {self.stats()}')
+
+    def close(self):
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        self._timeouts.clear()
+        self._breakers.clear()
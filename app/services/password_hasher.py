@@ -0,0 +1,79 @@
+import concurrent.futures
+import threading
+from gevent import monkey
+from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+# Raised when the hashing queue is full; routes answer 503 so the client retries later.
+class HasherBusyError(Exception):
+    pass
+
+
+# Spell out werkzeug's defaults, so "pbkdf2" compares equal to a stored "pbkdf2:sha256:600000":
+def canonical_method(method):
+    parts = method.split(':')
+    if parts[0] == 'scrypt':
+        defaults = ['scrypt', '32768', '8', '1']
+    elif parts[0] == 'pbkdf2':
+        defaults = ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join(parts + defaults[len(parts):])
+
+
+# Runs password hashing off the request's event loop.
+#
+# PBKDF2/scrypt are pure CPU for tens to hundreds of milliseconds. Under gunicorn's single
+# gevent worker, hashing inline stalls every other in-flight request. Instead, hashes run on
+# a small pool of real OS threads (hashlib releases the GIL while it works) and the calling
+# greenlet just waits. At most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE hashes may be
+# running or queued; beyond that callers get HasherBusyError instead of piling up.
+class PasswordHasher:
+    def __init__(self, method='scrypt:32768:8:1', workers=2, queue_size=32):
+        self.method = method
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.method = app.config.setdefault('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.setdefault('PASSWORD_HASH_WORKERS', self.workers)
+        self.queue_size = app.config.setdefault('PASSWORD_HASH_QUEUE_SIZE', self.queue_size)
+        self.shutdown()
+
+    def _start(self):
+        # With gevent's monkey-patching a regular thread pool would run on greenlets (i.e. on the
+        # event loop), so use gevent's pool of native threads in that case.
+        if monkey.is_module_patched('threading'):
+            self._executor = GeventThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            self._start()
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError('Too many password hashes in progress')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    # Stored hashes look like "<method>$<salt>$<hash>"; rehash when the method or its parameters changed:
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != canonical_method(self.method)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._slots = None
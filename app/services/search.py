@@ -0,0 +1,105 @@
+import re
+from sqlalchemy import DDL, Float, Integer, String, cast, column, event, func, literal, literal_column, null, table, union_all
+from app import db
+from app.models.expense import Expense
+from app.models.packing_list import PackingList
+from app.models.item import Item
+
+# Full-text search over item descriptions, packing list names and expense descriptions.
+#
+# PostgreSQL: GIN expression indexes on to_tsvector(...) of each column; the database keeps them
+# current on every INSERT/UPDATE/DELETE. SQLite (local runs and tests): an external-content FTS5 table
+# per column, kept current by triggers. Either way no route has to maintain the index itself.
+
+SEARCH_CONFIG = 'english'
+
+# (resource, model, searched column name, FTS5 table):
+SEARCHABLE = (
+    ('item', Item, 'description', 'item_fts'),
+    ('packing_list', PackingList, 'listName', 'packing_list_fts'),
+    ('expense', Expense, 'description', 'expense_fts'),
+)
+
+
+def postgresql_ddl(table_name, column_name):
+    return [DDL(
+        f'CREATE INDEX IF NOT EXISTS ix_{table_name}_{column_name.lower()}_fts ON {table_name} '
+        f'USING gin (to_tsvector(\'{SEARCH_CONFIG}\'::regconfig, "{column_name}"))'
+    )]
+
+
+def sqlite_ddl(table_name, column_name, fts_table):
+    values = f'new.id, new."{column_name}"'
+    delete = f'INSERT INTO {fts_table}({fts_table}, rowid, "{column_name}") VALUES (\'delete\', old.id, old."{column_name}");'
+    return [
+        DDL(f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("{column_name}", '
+            f'content=\'{table_name}\', content_rowid=\'id\', tokenize=\'porter unicode61\')'),
+        DDL(f'CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table_name} BEGIN '
+            f'INSERT INTO {fts_table}(rowid, "{column_name}") VALUES ({values}); END'),
+        DDL(f'CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table_name} BEGIN {delete} END'),
+        DDL(f'CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF "{column_name}" ON {table_name} BEGIN '
+            f'{delete} INSERT INTO {fts_table}(rowid, "{column_name}") VALUES ({values}); END'),
+    ]
+
+
+# Create the text indexes along with their tables (db.create_all), and drop the FTS5 tables with them:
+for _, model, column_name, fts_table in SEARCHABLE:
+    for ddl in postgresql_ddl(model.__tablename__, column_name):
+        event.listen(model.__table__, 'after_create', ddl.execute_if(dialect='postgresql'))
+    for ddl in sqlite_ddl(model.__tablename__, column_name, fts_table):
+        event.listen(model.__table__, 'after_create', ddl.execute_if(dialect='sqlite'))
+    event.listen(model.__table__, 'before_drop', DDL(f'DROP TABLE IF EXISTS {fts_table}').execute_if(dialect='sqlite'))
+
+
+# Words of the user's query; punctuation never reaches the database's query syntax:
+def search_terms(q):
+    return re.findall(r'\w+', q.lower())
+
+
+# One SELECT per resource: matches owned by the user as (type, id, text, listId, score), higher score first.
+def resource_query(resource, model, column_name, fts_table, user_id, terms):
+    searched = getattr(model, column_name)
+    list_id = Item.listId if model is Item else cast(null(), Integer)
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+        # Same expression as the GIN index, so the index is used:
+        vector = func.to_tsvector(config, searched)
+        tsquery = func.plainto_tsquery(config, ' '.join(terms))
+        score = func.ts_rank(vector, tsquery)
+        match = vector.op('@@')(tsquery)
+        query = db.select(literal(resource, String).label('type'), model.id.label('id'), searched.label('text'),
+                          list_id.label('listId'), cast(score, Float).label('score'))
+    else:
+        fts = table(fts_table, column('rowid'))
+        # bm25() is lower for better matches; every term quoted, so they are ANDed as plain words:
+        score = -func.bm25(literal_column(fts_table))
+        match = literal_column(fts_table).op('MATCH')(' '.join(f'"{term}"' for term in terms))
+        query = db.select(literal(resource, String).label('type'), model.id.label('id'), searched.label('text'),
+                          list_id.label('listId'), cast(score, Float).label('score')) \
+            .select_from(fts).join(model, model.id == fts.c.rowid)
+
+    if model is Item:
+        query = query.join(PackingList, PackingList.id == Item.listId).where(PackingList.user_id == user_id)
+    else:
+        query = query.where(model.user_id == user_id)
+    return query.where(match)
+
+
+# Ranked hits across the requested resources, best first. Returns up to `limit` hits after `offset`,
+# plus whether there are more.
+def search(user_id, q, resources, limit, offset):
+    terms = search_terms(q)
+    if not terms:
+        return [], False
+
+    queries = [
+        resource_query(resource, model, column_name, fts_table, user_id, terms)
+        for resource, model, column_name, fts_table in SEARCHABLE
+        if resource in resources
+    ]
+    hits = union_all(*queries).subquery()
+    rows = db.session.execute(
+        db.select(hits).order_by(hits.c.score.desc(), hits.c.type, hits.c.id).limit(limit + 1).offset(offset)
+    ).mappings().all()
+    return [dict(row) for row in rows[:limit]], len(rows) > limit
@@ -0,0 +1,56 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Request coalescing: concurrent callers asking for the same key share one in-flight call.
+# The first caller (the leader) runs fn(); everyone arriving before it finishes waits and
+# gets the same result, or has the same exception raised (a RuntimeError if the leader was interrupted).
+#
+# Under gunicorn's gevent worker threading is monkey-patched, so waiting on the Event
+# just parks the greenlet until the leader's upstream call returns.
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            # The leader was killed or timed out (GreenletExit, gevent.Timeout): waiters get an
+            # error of their own rather than that signal, or a None result.
+            call.error = RuntimeError(f'In-flight call for {key!r} was interrupted')
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
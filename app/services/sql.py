@@ -0,0 +1,25 @@
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+
+# INSERT construct for the session's database, supporting .on_conflict_do_update()/.on_conflict_do_nothing().
+# PostgreSQL in production, SQLite locally and in tests - both speak INSERT ... ON CONFLICT.
+def upsert_insert(table):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+# SQLite only enforces foreign keys (and so ON DELETE CASCADE) when asked to, per connection:
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+# SQL expression for the 'YYYY-MM' month of a date column:
+def sql_month_of(column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
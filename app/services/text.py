@@ -0,0 +1,4 @@
+# Collapse runs of whitespace and lowercase, so " Paris  " and "paris" compare equal.
+# None becomes '', the stored value for an omitted country or search term.
+def normalize_text(value):
+    return ' '.join((value or '').split()).lower()
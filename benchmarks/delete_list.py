@@ -0,0 +1,92 @@
+# Time and statements needed to delete a packing list with many items.
+#
+# "orm cascade" loads the items and deletes them one by one before the list, which is what
+# DELETE /packing-list/<id> did before the relationship used passive_deletes; "on delete cascade"
+# issues one DELETE for the list and lets the database remove the items.
+#
+#   python benchmarks/delete_list.py [items] [rounds]
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SQLALCHEMY_TEST_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark')
+
+import logging
+from sqlalchemy import event, insert
+from app import create_app, db
+
+
+def create_list(user_id, items):
+    from app.models.packing_list import PackingList
+    from app.models.item import Item
+
+    packing_list = PackingList(listName='Benchmark trip', user_id=user_id)
+    db.session.add(packing_list)
+    db.session.flush()
+    db.session.execute(insert(Item), [{'description': f'Item {i}', 'listId': packing_list.id} for i in range(items)])
+    db.session.commit()
+    return packing_list.id
+
+
+def delete_list(list_id, load_items):
+    from app.models.packing_list import PackingList
+
+    packing_list = db.session.get(PackingList, list_id)
+    if load_items:
+        # Loaded children are still deleted by the ORM, one statement per row:
+        packing_list.items
+    db.session.delete(packing_list)
+    db.session.commit()
+
+
+def run(user_id, items, rounds, load_items):
+    statements = []
+
+    # An executemany of N parameter sets still runs the statement N times:
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.extend([statement] * (len(parameters) if executemany else 1))
+
+    timings = []
+    for _ in range(rounds):
+        list_id = create_list(user_id, items)
+        db.session.expunge_all()
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', count)
+        started = time.perf_counter()
+        delete_list(list_id, load_items)
+        timings.append((time.perf_counter() - started) * 1000)
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return {'median_ms': statistics.median(timings), 'statements': len(statements)}
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    app = create_app('testing')
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        db.create_all()
+        from app.models.user import User
+        user = User(username='bench', email='bench@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        results = (
+            ('orm cascade', run(user_id, items, rounds, load_items=True)),
+            ('on delete cascade', run(user_id, items, rounds, load_items=False)),
+        )
+        dialect = db.engine.dialect.name
+
+    print(f'Deleting a list of {items} items, median of {rounds} rounds ({dialect})')
+    print(f"{'mode':<20}{'ms':>10}{'statements':>12}")
+    for mode, result in results:
+        print(f"{mode:<20}{result['median_ms']:>10.1f}{result['statements']:>12}")
+
+
+if __name__ == '__main__':
+    main()
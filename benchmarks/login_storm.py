@@ -0,0 +1,82 @@
+# Latency of a cheap endpoint (GET /packing-list) while a burst of logins is hashing passwords.
+#
+# Runs everything in one gevent-patched process, like gunicorn's single gevent worker,
+# once with hashing inline on the event loop and once on the password hasher's thread pool.
+#
+#   python benchmarks/login_storm.py [logins] [probes]
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import statistics
+import sys
+import time
+import gevent
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SQLALCHEMY_TEST_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark')
+
+import logging
+from flask_jwt_extended import create_access_token
+from app import create_app, db, password_hasher
+
+
+def run(app, logins, probes):
+    client = app.test_client()
+    with app.app_context():
+        access_token = create_access_token(identity={'id': 1})
+    latencies = []
+
+    def login():
+        client.post('/user/login', json={'username': 'storm', 'password': 'secret'})
+
+    # Probes "arrive" every 10ms; latency is measured from arrival, so time spent waiting
+    # for a blocked event loop counts, just as it would for a real client.
+    def probe(arrival):
+        gevent.sleep(max(0, arrival - time.perf_counter()))
+        client.get('/packing-list', headers={'Authorization': f'Bearer {access_token}'})
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    started = time.perf_counter()
+    probe_greenlets = [gevent.spawn(probe, started + i * 0.01) for i in range(probes)]
+    gevent.joinall(probe_greenlets + [gevent.spawn(login) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'max': latencies[-1],
+        'total_s': elapsed
+    }
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    probes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    app = create_app('testing')
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        db.create_all()
+        from app.models.user import User
+        user = User(username='storm', email='storm@example.com')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+
+    offloaded = run(app, logins, probes)
+
+    # Same storm with hashing inline on the event loop (the old behaviour):
+    password_hasher._run = lambda fn, *args: fn(*args)
+    inline = run(app, logins, probes)
+
+    print(f'{logins} concurrent logins, {probes} probe requests, method={password_hasher.method}')
+    print(f"{'mode':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total s':>10}")
+    for mode, result in (('inline', inline), ('offloaded', offloaded)):
+        print(f"{mode:<12}{result['p50']:>10.1f}{result['p95']:>10.1f}{result['max']:>10.1f}{result['total_s']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Add full-text search indexes
+
+Revision ID: 167fd400ef1b
+Revises: 85bb92b72ead
+Create Date: 2026-10-18 16:05:37.915240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '167fd400ef1b'
+down_revision = '85bb92b72ead'
+branch_labels = None
+depends_on = None
+
+# (table, searched column, SQLite FTS5 table) - see app/services/search.py
+SEARCHABLE = (
+    ('item', 'description', 'item_fts'),
+    ('packing_list', 'listName', 'packing_list_fts'),
+    ('expense', 'description', 'expense_fts'),
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # GIN expression indexes; PostgreSQL keeps them current on every write.
+        for table, column, _ in SEARCHABLE:
+            op.execute(f'CREATE INDEX ix_{table}_{column.lower()}_fts ON {table} '
+                       f'USING gin (to_tsvector(\'english\'::regconfig, "{column}"))')
+        return
+
+    # SQLite: external-content FTS5 tables kept current by triggers, filled from the existing rows.
+    for table, column, fts in SEARCHABLE:
+        delete = f'INSERT INTO {fts}({fts}, rowid, "{column}") VALUES (\'delete\', old.id, old."{column}");'
+        insert = f'INSERT INTO {fts}(rowid, "{column}") VALUES (new.id, new."{column}");'
+        op.execute(f'CREATE VIRTUAL TABLE {fts} USING fts5("{column}", content=\'{table}\', content_rowid=\'id\', '
+                   f'tokenize=\'porter unicode61\')')
+        op.execute(f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END')
+        op.execute(f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END')
+        op.execute(f'CREATE TRIGGER {fts}_update AFTER UPDATE OF "{column}" ON {table} BEGIN {delete} {insert} END')
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, column, _ in SEARCHABLE:
+            op.drop_index(f'ix_{table}_{column.lower()}_fts', table_name=table)
+        return
+
+    for table, column, fts in SEARCHABLE:
+        for trigger in ('insert', 'delete', 'update'):
+            op.execute(f'DROP TRIGGER {fts}_{trigger}')
+        op.execute(f'DROP TABLE {fts}')
@@ -0,0 +1,59 @@
+"""Add updated_at tracking and deleted_record tombstones for sync
+
+Revision ID: 6063892ded8c
+Revises: ff9bf5bbf23b
+Create Date: 2026-10-18 14:58:12.640917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6063892ded8c'
+down_revision = 'ff9bf5bbf23b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('deleted_record',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('resource', sa.String(length=20), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deleted_record_user_id_deleted_at', 'deleted_record', ['user_id', 'deleted_at'], unique=False)
+
+    # Existing rows count as changed now; the column is made NOT NULL once they are filled in.
+    # updated_at is naive UTC (datetime.utcnow), but PostgreSQL's CURRENT_TIMESTAMP is in the session
+    # time zone, so take UTC explicitly there. SQLite's CURRENT_TIMESTAMP is already UTC.
+    if op.get_bind().dialect.name == 'postgresql':
+        now = "timezone('utc', now())"
+    else:
+        now = 'CURRENT_TIMESTAMP'
+    for table in ('expense', 'packing_list', 'item'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE {table} SET updated_at = {now}')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index('ix_expense_user_id_updated_at', 'expense', ['user_id', 'updated_at'], unique=False)
+    op.create_index('ix_packing_list_user_id_updated_at', 'packing_list', ['user_id', 'updated_at'], unique=False)
+    op.create_index('ix_item_listId_updated_at', 'item', ['listId', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_listId_updated_at', table_name='item')
+    op.drop_index('ix_packing_list_user_id_updated_at', table_name='packing_list')
+    op.drop_index('ix_expense_user_id_updated_at', table_name='expense')
+    for table in ('item', 'packing_list', 'expense'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
+
+    op.drop_index('ix_deleted_record_user_id_deleted_at', table_name='deleted_record')
+    op.drop_table('deleted_record')
@@ -0,0 +1,38 @@
+"""Delete items with their packing list (ON DELETE CASCADE)
+
+Revision ID: 85bb92b72ead
+Revises: 6063892ded8c
+Create Date: 2026-10-18 15:31:44.208356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '85bb92b72ead'
+down_revision = '6063892ded8c'
+branch_labels = None
+depends_on = None
+
+# The original foreign key was unnamed: PostgreSQL called it item_listId_fkey, SQLite has no name for it
+# (batch mode recreates the table, and the naming convention lets it find the constraint).
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def replace_item_list_fkey(ondelete):
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('item_listId_fkey', 'item', type_='foreignkey')
+        op.create_foreign_key('item_listId_fkey', 'item', 'packing_list', ['listId'], ['id'], ondelete=ondelete)
+        return
+    with op.batch_alter_table('item', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('item_listId_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('item_listId_fkey', 'packing_list', ['listId'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    replace_item_list_fkey('CASCADE')
+
+
+def downgrade():
+    replace_item_list_fkey(None)
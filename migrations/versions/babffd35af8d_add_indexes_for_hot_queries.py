@@ -0,0 +1,31 @@
+"""Add indexes for hot queries, make user.username unique
+
+Revision ID: babffd35af8d
+Revises: 1bcf1ec4a93d
+Create Date: 2026-10-18 11:26:52.310448
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'babffd35af8d'
+down_revision = '1bcf1ec4a93d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Duplicate usernames must be resolved before this runs, or the unique index can't be built.
+    op.create_index('ix_user_username', 'user', ['username'], unique=True)
+    op.create_index('ix_expense_user_id_date', 'expense', ['user_id', 'date'], unique=False)
+    op.create_index('ix_packing_list_user_id', 'packing_list', ['user_id'], unique=False)
+    op.create_index('ix_item_listId', 'item', ['listId'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_listId', table_name='item')
+    op.drop_index('ix_packing_list_user_id', table_name='packing_list')
+    op.drop_index('ix_expense_user_id_date', table_name='expense')
+    op.drop_index('ix_user_username', table_name='user')
@@ -0,0 +1,29 @@
+"""Expense keyset pagination indexes
+
+Revision ID: e04668d53fbd
+Revises: babffd35af8d
+Create Date: 2026-10-18 12:02:10.871530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e04668d53fbd'
+down_revision = 'babffd35af8d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (user_id, date, id) serves the keyset ORDER BY date DESC, id DESC; it replaces (user_id, date).
+    op.create_index('ix_expense_user_id_date_id', 'expense', ['user_id', 'date', 'id'], unique=False)
+    op.create_index('ix_expense_user_id_category_date_id', 'expense', ['user_id', 'category', 'date', 'id'], unique=False)
+    op.drop_index('ix_expense_user_id_date', table_name='expense')
+
+
+def downgrade():
+    op.create_index('ix_expense_user_id_date', 'expense', ['user_id', 'date'], unique=False)
+    op.drop_index('ix_expense_user_id_category_date_id', table_name='expense')
+    op.drop_index('ix_expense_user_id_date_id', table_name='expense')
@@ -0,0 +1,25 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+
+
+# Record the SQL statements run inside the block:
+#   with count_queries() as statements: ...
+# Needs an app context, like the module-level test_client fixtures provide.
+@pytest.fixture
+def count_queries():
+    @contextmanager
+    def counting():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counting
@@ -0,0 +1,79 @@
+import pytest
+from app import create_app, db, password_hasher
+from app.models.user import User
+from app.services.password_hasher import HasherBusyError, PasswordHasher
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+def test_register_and_login(test_client):
+    response = test_client.post('/user/register', json={'username': 'authuser', 'password': 'secret', 'email': 'auth@test.com'})
+    assert response.status_code == 200
+
+    response = test_client.post('/user/login', json={'username': 'authuser', 'password': 'secret'})
+    assert response.status_code == 200
+    assert 'access_token' in response.json
+
+    response = test_client.post('/user/login', json={'username': 'authuser', 'password': 'wrong'})
+    assert response.status_code == 401
+
+
+def test_login_rehashes_outdated_password_hash(test_client, monkeypatch):
+    # Store a hash made with older, cheaper parameters:
+    monkeypatch.setattr(password_hasher, 'method', 'pbkdf2:sha256:1000')
+    with test_client.application.app_context():
+        user = User(username='legacyuser', email='legacy@test.com')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+    monkeypatch.undo()
+
+    response = test_client.post('/user/login', json={'username': 'legacyuser', 'password': 'secret'})
+    assert response.status_code == 200
+
+    with test_client.application.app_context():
+        user = User.query.filter_by(username='legacyuser').first()
+        assert user.password.startswith(password_hasher.method + '$')
+        assert not user.password_needs_rehash()
+        assert user.check_password('secret')
+
+
+def test_failed_login_does_not_rehash(test_client, monkeypatch):
+    monkeypatch.setattr(password_hasher, 'method', 'pbkdf2:sha256:1000')
+    with test_client.application.app_context():
+        user = User(username='wrongpassuser', email='wrong@test.com')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        stored_hash = user.password
+    monkeypatch.undo()
+
+    response = test_client.post('/user/login', json={'username': 'wrongpassuser', 'password': 'nope'})
+    assert response.status_code == 401
+
+    with test_client.application.app_context():
+        assert User.query.filter_by(username='wrongpassuser').first().password == stored_hash
+
+
+def test_login_returns_503_when_hasher_queue_is_full(test_client, monkeypatch):
+    def busy(*args):
+        raise HasherBusyError('Too many password hashes in progress')
+
+    monkeypatch.setattr(password_hasher, '_run', busy)
+    response = test_client.post('/user/login', json={'username': 'authuser', 'password': 'secret'})
+    assert response.status_code == 503
+
+
+def test_pbkdf2_method_defaults_are_spelled_out():
+    password_hash = 'pbkdf2:sha256:600000$salt$hash'
+    hasher = PasswordHasher(method='pbkdf2')
+    assert not hasher.needs_rehash(password_hash)
+    assert PasswordHasher(method='pbkdf2:sha256:700000').needs_rehash(password_hash)
@@ -0,0 +1,211 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app, db, outbound
+from app.models.user import User
+from app.models.yelp_search_cache import YelpSearchCache
+from flask_jwt_extended import create_access_token
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return self.payload
+
+
+def business(id, rating, review_count, categories=('Italian',)):
+    return {
+        'id': id,
+        'name': f'Place {id}',
+        'categories': [{'title': title} for title in categories],
+        'location': {'display_address': ['1 Main St', 'Springfield']},
+        'rating': rating,
+        'review_count': review_count
+    }
+
+
+BUSINESSES = [
+    business('a', 4.5, 100),
+    business('b', 3.5, 900),
+    business('c', 4.8, 50, categories=('Fast Food',)),
+    business('d', 4.0, 300)
+]
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+@pytest.fixture
+def auth_token(test_client):
+    with test_client.application.app_context():
+        # Usernames are unique, so reuse the user created by an earlier test in this module:
+        user = User.query.filter_by(username='dininguser').first()
+        if user is None:
+            user = User(username='dininguser', email='dining@test.com')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+
+        access_token = create_access_token(identity={'id': user.id})
+    return access_token
+
+
+@pytest.fixture
+def yelp_calls(test_client, monkeypatch):
+    calls = []
+
+    # Every search fetches several pages; only the first page has results:
+    def fake_get(provider, url, params=None, **kwargs):
+        if params['offset'] == 0:
+            calls.append(params)
+            return FakeResponse({'businesses': BUSINESSES})
+        return FakeResponse({'businesses': []})
+
+    with test_client.application.app_context():
+        YelpSearchCache.query.delete()
+        db.session.commit()
+    monkeypatch.setattr(outbound, 'get', fake_get)
+    return calls
+
+
+def test_recommendations_filters_and_ranks(test_client, auth_token, yelp_calls):
+    response = test_client.get('/recommendations?city=Springfield', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert [rec['id'] for rec in response.json['recommendations']] == ['d', 'a']
+
+
+def test_recommendations_are_cached_in_the_database(test_client, auth_token, yelp_calls):
+    test_client.get('/recommendations?city=Springfield&term=pasta', headers={'Authorization': f'Bearer {auth_token}'})
+    response = test_client.get('/recommendations?city=springfield &term=Pasta', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert len(yelp_calls) == 1
+
+    with test_client.application.app_context():
+        cached = YelpSearchCache.query.filter_by(location='springfield', term='pasta').one()
+        assert len(cached.results) == len(BUSINESSES)
+
+
+def test_expired_cache_rows_are_refetched(test_client, auth_token, yelp_calls):
+    test_client.get('/recommendations?city=Springfield', headers={'Authorization': f'Bearer {auth_token}'})
+
+    with test_client.application.app_context():
+        cached = YelpSearchCache.query.filter_by(location='springfield', term='').one()
+        cached.fetched_at = datetime.utcnow() - timedelta(days=2)
+        db.session.commit()
+
+    test_client.get('/recommendations?city=Springfield', headers={'Authorization': f'Bearer {auth_token}'})
+    assert len(yelp_calls) == 2
+
+
+def test_expired_cache_rows_are_served_when_yelp_fails(test_client, auth_token, yelp_calls, monkeypatch):
+    test_client.get('/recommendations?city=Springfield', headers={'Authorization': f'Bearer {auth_token}'})
+
+    with test_client.application.app_context():
+        cached = YelpSearchCache.query.filter_by(location='springfield', term='').one()
+        cached.fetched_at = datetime.utcnow() - timedelta(days=2)
+        db.session.commit()
+
+    monkeypatch.setattr(outbound, 'get', lambda provider, url, **kwargs: FakeResponse({}, 500))
+    response = test_client.get('/recommendations?city=Springfield', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert [rec['id'] for rec in response.json['recommendations']] == ['d', 'a']
+
+    response = test_client.get('/recommendations?city=Shelbyville', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 500
+    assert response.json['error'] == 'Failed to fetch data from Yelp API'
+
+
+def test_recommendations_scan_every_page(test_client, auth_token, yelp_calls, monkeypatch):
+    pages = {
+        0: [business('a', 4.5, 100), business('b', 4.2, 20)],
+        50: [business('e', 4.6, 5000), business('a', 4.5, 100)],
+        100: [business('f', 4.9, 700, categories=('Deli',))]
+    }
+    offsets = []
+
+    def fake_get(provider, url, params=None, **kwargs):
+        offsets.append(params['offset'])
+        return FakeResponse({'businesses': pages.get(params['offset'], [])})
+
+    monkeypatch.setattr(outbound, 'get', fake_get)
+
+    response = test_client.get('/recommendations?city=Capital City&limit=10', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert sorted(offsets) == [0, 50, 100]
+    # The best result was on the second page, and the duplicate "a" is only listed once:
+    assert [rec['id'] for rec in response.json['recommendations']] == ['e', 'a', 'b']
+
+
+def test_recommendations_ranking_parameters(test_client, auth_token, yelp_calls):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+
+    response = test_client.get('/recommendations?city=Springfield&limit=1', headers=headers)
+    assert [rec['id'] for rec in response.json['recommendations']] == ['d']
+
+    response = test_client.get('/recommendations?city=Springfield&min_rating=3', headers=headers)
+    assert [rec['id'] for rec in response.json['recommendations']] == ['b', 'd', 'a']
+
+    response = test_client.get('/recommendations?city=Springfield&exclude=', headers=headers)
+    assert [rec['id'] for rec in response.json['recommendations']] == ['d', 'a', 'c']
+
+    # All of the above were served from one cached Yelp search:
+    assert len(yelp_calls) == 1
+
+    response = test_client.get('/recommendations?city=Springfield&limit=0', headers=headers)
+    assert response.status_code == 400
+    response = test_client.get('/recommendations?city=Springfield&min_rating=high', headers=headers)
+    assert response.status_code == 400
+
+
+def test_recommendations_survive_a_failed_later_page(test_client, auth_token, yelp_calls, monkeypatch):
+    def fake_get(provider, url, params=None, **kwargs):
+        if params['offset'] == 0:
+            return FakeResponse({'businesses': BUSINESSES})
+        return FakeResponse({}, 503)
+
+    monkeypatch.setattr(outbound, 'get', fake_get)
+
+    response = test_client.get('/recommendations?city=Ogdenville', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert [rec['id'] for rec in response.json['recommendations']] == ['d', 'a']
+
+
+def test_partial_results_are_not_cached(test_client, auth_token, yelp_calls, monkeypatch):
+    def fake_get(provider, url, params=None, **kwargs):
+        yelp_calls.append(params)
+        if params['offset'] == 0:
+            return FakeResponse({'businesses': BUSINESSES})
+        # A 200 whose body isn't JSON fails that page only:
+        return FakeResponse(ValueError('Expecting value'))
+
+    monkeypatch.setattr(outbound, 'get', fake_get)
+    headers = {'Authorization': f'Bearer {auth_token}'}
+
+    for _ in range(2):
+        response = test_client.get('/recommendations?city=Shelbyville', headers=headers)
+        assert response.status_code == 200
+        assert [rec['id'] for rec in response.json['recommendations']] == ['d', 'a']
+
+    # Nothing was cached, so the second request went back to Yelp:
+    assert sum(1 for params in yelp_calls if params['offset'] == 0) == 2
+    with test_client.application.app_context():
+        assert YelpSearchCache.query.count() == 0
+
+
+def test_yelp_search_pages_is_at_least_one(test_client, auth_token, yelp_calls, monkeypatch):
+    monkeypatch.setitem(test_client.application.config, 'YELP_SEARCH_PAGES', 0)
+
+    response = test_client.get('/recommendations?city=Capital City', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert len(yelp_calls) == 1
@@ -0,0 +1,387 @@
+import pytest
+from datetime import date, timedelta
+from app import create_app, db
+from app.models.expense import Expense
+from app.models.expense_summary import ExpenseSummary
+from app.models.user import User
+from app.services.sql import sql_month_of
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+@pytest.fixture
+def user_id(test_client):
+    with test_client.application.app_context():
+        # Usernames are unique, so reuse the user created by an earlier test in this module:
+        user = User.query.filter_by(username='expenseuser').first()
+        if user is None:
+            user = User(username='expenseuser', email='expense@test.com')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+        # Start every test with no expenses:
+        Expense.query.filter_by(user_id=user.id).delete()
+        ExpenseSummary.query.filter_by(user_id=user.id).delete()
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def auth_headers(test_client, user_id):
+    with test_client.application.app_context():
+        access_token = create_access_token(identity={'id': user_id})
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def add_expenses(test_client, user_id, count, category='Food', start=date(2024, 1, 1)):
+    with test_client.application.app_context():
+        expenses = [
+            Expense(amount=10 + i, description=f'Expense {i}', date=start + timedelta(days=i // 2),
+                    user_id=user_id, category=category)
+            for i in range(count)
+        ]
+        db.session.add_all(expenses)
+        # Keep the rollups in step, as the routes do:
+        deltas = {}
+        for expense in expenses:
+            key = (category, ExpenseSummary.month_key(expense.date))
+            total, added = deltas.get(key, (0, 0))
+            deltas[key] = (total + expense.amount, added + 1)
+        ExpenseSummary.apply_deltas(user_id, deltas)
+        db.session.commit()
+
+
+def test_get_expenses_pages_through_everything_once(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 25)
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/expenses?limit=10' + (f'&cursor={cursor}' if cursor else '')
+        response = test_client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        seen.extend(response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+
+    assert len(seen) == 25
+    assert len({expense['id'] for expense in seen}) == 25
+    # Newest first, ties broken by id:
+    assert seen == sorted(seen, key=lambda expense: (expense['date'], expense['id']), reverse=True)
+
+
+def test_get_expenses_without_paging_returns_everything(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 60)
+
+    response = test_client.get('/expenses', headers={**auth_headers, 'Origin': 'https://travel-valet.onrender.com'})
+    assert len(response.json) == 60
+    assert 'X-Next-Cursor' not in response.headers
+    # Browser clients can read the paging and caching headers:
+    exposed = response.headers['Access-Control-Expose-Headers']
+    assert 'X-Next-Cursor' in exposed and 'ETag' in exposed
+
+    # Asking for a page gets the default page size and a cursor:
+    response = test_client.get('/expenses?limit=50', headers=auth_headers)
+    assert len(response.json) == 50
+    response = test_client.get(f"/expenses?cursor={response.headers['X-Next-Cursor']}", headers=auth_headers)
+    assert len(response.json) == 10
+
+
+def test_get_expenses_filters(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 10, category='Food')
+    add_expenses(test_client, user_id, 4, category='Transport', start=date(2024, 3, 1))
+
+    response = test_client.get('/expenses?category=Transport', headers=auth_headers)
+    assert [expense['category'] for expense in response.json] == ['Transport'] * 4
+
+    response = test_client.get('/expenses?start=2024-01-02&end=2024-01-03', headers=auth_headers)
+    assert {expense['date'] for expense in response.json} == {'2024-01-02', '2024-01-03'}
+    assert len(response.json) == 4
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_get_expenses_rejects_bad_arguments(test_client, user_id, auth_headers):
+    assert test_client.get('/expenses?limit=0', headers=auth_headers).status_code == 400
+    assert test_client.get('/expenses?limit=abc', headers=auth_headers).status_code == 400
+    assert test_client.get('/expenses?cursor=garbage', headers=auth_headers).status_code == 400
+    assert test_client.get('/expenses?start=yesterday', headers=auth_headers).status_code == 400
+
+
+def test_expense_summary_follows_add_update_delete(test_client, user_id, auth_headers):
+    def post(amount, category, date):
+        response = test_client.post('/expenses', json={
+            'amount': amount, 'description': 'Trip', 'date': date, 'category': category
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        return response.json['id']
+
+    taxi = post(20.5, 'Transport', '2024-05-03')
+    post(12, 'Food', '2024-05-04')
+    dinner = post(30, 'Food', '2024-06-01')
+
+    # Move the taxi to June and change its amount, then delete dinner:
+    response = test_client.put(f'/expenses/{taxi}', json={
+        'amount': 25, 'description': 'Taxi', 'date': '2024-06-02', 'category': 'Transport'
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert test_client.delete(f'/expenses/{dinner}', headers=auth_headers).status_code == 200
+
+    summary = test_client.get('/expenses/summary', headers=auth_headers).json
+    assert summary['total'] == 37
+    assert summary['count'] == 2
+    assert summary['by_category'] == [
+        {'category': 'Food', 'total': 12, 'count': 1},
+        {'category': 'Transport', 'total': 25, 'count': 1}
+    ]
+    assert summary['by_month'] == [
+        {'month': '2024-05', 'total': 12, 'count': 1},
+        {'month': '2024-06', 'total': 25, 'count': 1}
+    ]
+    # Emptied rollup rows are removed:
+    assert len(summary['by_category_month']) == 2
+
+
+def test_rebuild_expense_summaries_checks_incremental_state(test_client, user_id, auth_headers):
+    test_client.post('/expenses', json={
+        'amount': 40, 'description': 'Museum', 'date': '2024-07-10', 'category': 'Fun'
+    }, headers=auth_headers)
+    runner = test_client.application.test_cli_runner()
+
+    result = runner.invoke(args=['rebuild-expense-summaries', '--check'])
+    assert result.exit_code == 0
+    assert '0 of' in result.output
+
+    # Drift the rollup, detect it, then repair it:
+    with test_client.application.app_context():
+        ExpenseSummary.query.filter_by(user_id=user_id).update({'total': 1})
+        db.session.commit()
+    assert runner.invoke(args=['rebuild-expense-summaries', '--check']).exit_code == 1
+
+    result = runner.invoke(args=['rebuild-expense-summaries'])
+    assert result.exit_code == 0
+    summary = test_client.get('/expenses/summary', headers=auth_headers).json
+    assert summary['total'] == 40
+
+
+def test_import_expenses_from_csv(test_client, user_id, auth_headers, monkeypatch):
+    monkeypatch.setitem(test_client.application.config, 'EXPENSES_IMPORT_CHUNK_SIZE', 2)
+    body = (
+        'amount,description,date,category\n'
+        '12.50,Lunch,2024-08-01,Food\n'
+        '30,Train,2024-08-02,Transport\n'
+        ',Missing amount,2024-08-02,Food\n'
+        '8,Coffee,08/03/2024,Food\n'
+        '4.5,Snack,2024-08-03,Food\n'
+    )
+    response = test_client.post('/expenses/import', data=body, content_type='text/csv', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 3
+    assert response.json['failed'] == 2
+    assert response.json['errors'] == [
+        {'row': 3, 'message': 'All fields are required'},
+        {'row': 4, 'message': 'Invalid date: 08/03/2024'}
+    ]
+
+    expenses = test_client.get('/expenses', headers=auth_headers).json
+    assert sorted(expense['description'] for expense in expenses) == ['Lunch', 'Snack', 'Train']
+
+    # Imported rows are included in the rollups:
+    summary = test_client.get('/expenses/summary', headers=auth_headers).json
+    assert summary['by_category'] == [
+        {'category': 'Food', 'total': 17, 'count': 2},
+        {'category': 'Transport', 'total': 30, 'count': 1}
+    ]
+
+
+def test_import_expenses_from_ndjson(test_client, user_id, auth_headers):
+    body = '\n'.join([
+        '{"amount": 100, "description": "Hotel", "date": "2024-09-01", "category": "Lodging"}',
+        'not json',
+        '',
+        '["a", "list"]',
+        '{"amount": "abc", "description": "Hotel", "date": "2024-09-01", "category": "Lodging"}'
+    ])
+    response = test_client.post('/expenses/import', data=body, content_type='application/x-ndjson', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 1
+    assert [error['row'] for error in response.json['errors']] == [2, 4, 5]
+
+
+def test_import_expenses_rejects_non_text_fields_per_row(test_client, user_id, auth_headers):
+    body = '\n'.join([
+        '{"amount": 1, "description": 5, "date": "2024-09-01", "category": "Food"}',
+        '{"amount": 2, "description": "Bread", "date": "2024-09-01", "category": ["Food"]}',
+        '{"amount": 3, "description": "Jam", "date": "2024-09-01", "category": "Food"}'
+    ])
+    response = test_client.post('/expenses/import', data=body, content_type='application/x-ndjson', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 1
+    assert [error['row'] for error in response.json['errors']] == [1, 2]
+
+
+def test_import_expenses_rejects_non_finite_amounts_per_row(test_client, user_id, auth_headers):
+    body = (
+        'amount,description,date,category\n'
+        '5,Bus,2024-09-01,Transport\n'
+        'nan,Mystery,2024-09-01,Food\n'
+        'inf,Forever,2024-09-01,Food\n'
+        '-Infinity,Refund,2024-09-01,Food\n'
+        '7,Tram,2024-09-02,Transport\n'
+    )
+    response = test_client.post('/expenses/import', data=body, content_type='text/csv', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 2
+    assert response.json['errors'] == [
+        {'row': 2, 'message': 'Invalid amount: nan'},
+        {'row': 3, 'message': 'Invalid amount: inf'},
+        {'row': 4, 'message': 'Invalid amount: -inf'}
+    ]
+    assert test_client.get('/expenses/summary', headers=auth_headers).json['by_category'] == [
+        {'category': 'Transport', 'total': 12, 'count': 2}
+    ]
+
+
+def test_import_expenses_rejects_invalid_utf8_per_row(test_client, user_id, auth_headers):
+    body = (
+        b'amount,description,date,category\n'
+        b'\xff\xfe,Broken,2024-09-01,Food\n'
+        b'4,Caf\xc3\xa9,2024-09-02,Food\n'
+    )
+    response = test_client.post('/expenses/import?format=csv', data=body, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['imported'] == 1
+    assert response.json['errors'] == [{'row': 1, 'message': 'Row is not valid UTF-8'}]
+    assert [expense['description'] for expense in test_client.get('/expenses', headers=auth_headers).json] == ['Café']
+
+    response = test_client.post('/expenses/import', data=b'\xff\n{"amount": 1}', content_type='application/x-ndjson', headers=auth_headers)
+    assert response.status_code == 200
+    assert [error['row'] for error in response.json['errors']] == [1, 2]
+
+
+def test_import_expenses_accepts_a_byte_order_mark(test_client, user_id, auth_headers):
+    body = b'\xef\xbb\xbfamount,description,date,category\r\n9,Museum,2024-09-03,Fun\r\n'
+    response = test_client.post('/expenses/import', data=body, content_type='text/csv', headers=auth_headers)
+    assert response.status_code == 200
+    assert (response.json['imported'], response.json['failed']) == (1, 0)
+
+    body = b'\xef\xbb\xbf{"amount": 3, "description": "Ferry", "date": "2024-09-04", "category": "Transport"}\n'
+    response = test_client.post('/expenses/import', data=body, content_type='application/x-ndjson', headers=auth_headers)
+    assert (response.json['imported'], response.json['failed']) == (1, 0)
+
+
+def test_import_expenses_requires_a_known_format(test_client, user_id, auth_headers):
+    response = test_client.post('/expenses/import', data='{}', content_type='application/json', headers=auth_headers)
+    assert response.status_code == 415
+
+
+def test_batch_update_expenses(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 4, category='Misc')
+    ids = [expense['id'] for expense in test_client.get('/expenses', headers=auth_headers).json]
+
+    response = test_client.patch('/expenses/batch', json={
+        'ids': ids[:3] + [999999],
+        'changes': {'category': 'Transport', 'date': '2024-02-01'}
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert sorted(response.json['updated']) == sorted(ids[:3])
+    assert response.json['rejected'] == [999999]
+
+    expenses = test_client.get('/expenses?category=Transport', headers=auth_headers).json
+    assert sorted(expense['id'] for expense in expenses) == sorted(ids[:3])
+    assert {expense['date'] for expense in expenses} == {'2024-02-01'}
+
+    # Rollups moved with the expenses:
+    summary = test_client.get('/expenses/summary', headers=auth_headers).json
+    assert {row['category']: row['count'] for row in summary['by_category']} == {'Misc': 1, 'Transport': 3}
+
+
+def test_batch_update_expenses_by_filter(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 3, category='Food')
+    add_expenses(test_client, user_id, 2, category='Fun')
+
+    response = test_client.patch('/expenses/batch', json={
+        'filter': {'category': 'Fun'},
+        'changes': {'description': 'Concert'}
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json['updated']) == 2
+
+    expenses = test_client.get('/expenses?category=Fun', headers=auth_headers).json
+    assert {expense['description'] for expense in expenses} == {'Concert'}
+
+
+def test_batch_update_expenses_validates_request(test_client, user_id, auth_headers):
+    assert test_client.patch('/expenses/batch', json={'ids': [1], 'changes': {'amount': 'lots'}}, headers=auth_headers).status_code == 400
+    assert test_client.patch('/expenses/batch', json={'ids': [1], 'changes': {'user_id': 2}}, headers=auth_headers).status_code == 400
+    assert test_client.patch('/expenses/batch', json={'changes': {'amount': 1}}, headers=auth_headers).status_code == 400
+    assert test_client.patch('/expenses/batch', json={'ids': ['1'], 'changes': {'amount': 1}}, headers=auth_headers).status_code == 400
+    for amount in ('nan', 'inf', '-Infinity', True):
+        assert test_client.patch('/expenses/batch', json={'filter': {}, 'changes': {'amount': amount}}, headers=auth_headers).status_code == 400
+    # true == 1, but it isn't an id:
+    assert test_client.patch('/expenses/batch', json={'ids': [True], 'changes': {'amount': 1}}, headers=auth_headers).status_code == 400
+    assert test_client.delete('/expenses/batch', json={'ids': [True]}, headers=auth_headers).status_code == 400
+    # Filter values arrive as JSON, not query strings:
+    for filters in ({'start': 5}, {'end': ['2024-01-01']}, {'category': {'name': 'Food'}}):
+        assert test_client.patch('/expenses/batch', json={'filter': filters, 'changes': {'amount': 1}}, headers=auth_headers).status_code == 400
+        assert test_client.delete('/expenses/batch', json={'filter': filters}, headers=auth_headers).status_code == 400
+
+
+def test_batch_delete_expenses_only_touches_own_rows(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 3)
+    ids = [expense['id'] for expense in test_client.get('/expenses', headers=auth_headers).json]
+
+    # Another user's expense can't be deleted through the batch endpoint:
+    with test_client.application.app_context():
+        other = User(username='otherexpenseuser', email='other@test.com', password='x')
+        db.session.add(other)
+        db.session.flush()
+        foreign = Expense(amount=5, description='Not mine', date=date(2024, 1, 1), user_id=other.id, category='Food')
+        db.session.add(foreign)
+        db.session.commit()
+        foreign_id = foreign.id
+
+    response = test_client.delete('/expenses/batch', json={'ids': ids[:2] + [foreign_id]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert sorted(response.json['deleted']) == sorted(ids[:2])
+    assert response.json['rejected'] == [foreign_id]
+
+    assert [expense['id'] for expense in test_client.get('/expenses', headers=auth_headers).json] == ids[2:]
+    summary = test_client.get('/expenses/summary', headers=auth_headers).json
+    assert summary['count'] == 1
+    with test_client.application.app_context():
+        assert db.session.get(Expense, foreign_id) is not None
+
+
+def test_get_expenses_is_conditional(test_client, user_id, auth_headers):
+    add_expenses(test_client, user_id, 3)
+    response = test_client.get('/expenses', headers=auth_headers)
+    etag = response.headers['ETag']
+
+    response = test_client.get('/expenses', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    # Another filter is another representation:
+    assert test_client.get('/expenses?limit=1', headers={**auth_headers, 'If-None-Match': etag}).status_code == 200
+
+    summary_etag = test_client.get('/expenses/summary', headers=auth_headers).headers['ETag']
+    test_client.post('/expenses', json={
+        'amount': 5, 'description': 'Gum', 'date': '2024-01-05', 'category': 'Food'
+    }, headers=auth_headers)
+    assert test_client.get('/expenses', headers={**auth_headers, 'If-None-Match': etag}).status_code == 200
+    assert test_client.get('/expenses/summary', headers={**auth_headers, 'If-None-Match': summary_etag}).status_code == 200
+
+
+def test_sql_and_python_month_keys_agree(test_client):
+    # Rollups are written with month_key and rebuilt with sql_month_of, so both must give the same key:
+    with test_client.application.app_context():
+        for day in (date(2024, 1, 1), date(2024, 2, 29), date(2024, 12, 31), date(1999, 9, 9)):
+            assert db.session.scalar(db.select(sql_month_of(db.literal(day)))) == ExpenseSummary.month_key(day)
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import pytest
+from datetime import date
+from app import create_app, db
+from app.models.expense import Expense
+from app.models.packing_list import PackingList
+from app.models.item import Item
+from app.models.user import User
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+    # Small batches, so the tests cover more than one per resource:
+    app.config['EXPORT_YIELD_PER'] = 2
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+def add_account(username, expenses, items):
+    user = User(username=username, email=f'{username}@test.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([
+        Expense(amount=10 + i, description=f'Expense {i}', date=date(2024, 1, 1 + i), user_id=user.id, category='Food')
+        for i in range(expenses)
+    ])
+    packing_list = PackingList(listName=f'{username} trip', user_id=user.id)
+    packing_list.items = [Item(description=f'Item {i}', quantity=i + 1) for i in range(items)]
+    db.session.add(packing_list)
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture(scope='module')
+def auth_headers(test_client):
+    with test_client.application.app_context():
+        user_id = add_account('exportuser', 5, 3)
+        add_account('someoneelse', 2, 2)
+        access_token = create_access_token(identity={'id': user_id})
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def test_export_ndjson_streams_the_whole_account(test_client, auth_headers):
+    response = test_client.get('/export', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['type'] for record in records] == ['expense'] * 5 + ['packing_list'] + ['item'] * 3
+    assert records[0] == {'type': 'expense', 'id': records[0]['id'], 'amount': 10, 'description': 'Expense 0',
+                          'date': '2024-01-01', 'category': 'Food'}
+    assert records[5]['listName'] == 'exportuser trip'
+    assert {record['listId'] for record in records[6:]} == {records[5]['id']}
+
+
+def test_export_csv_of_one_resource(test_client, auth_headers):
+    response = test_client.get('/export?format=csv&resource=items', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['description'], row['quantity']) for row in rows] == [('Item 0', '1'), ('Item 1', '2'), ('Item 2', '3')]
+
+
+def test_export_validates_arguments(test_client, auth_headers):
+    assert test_client.get('/export?format=xml', headers=auth_headers).status_code == 400
+    assert test_client.get('/export?resource=users', headers=auth_headers).status_code == 400
+    # CSV has a single header row, so it needs a resource:
+    assert test_client.get('/export?format=csv', headers=auth_headers).status_code == 400
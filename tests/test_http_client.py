@@ -0,0 +1,107 @@
+import pytest
+import requests
+from app.services.errors import UpstreamError, CircuitOpenError
+from app.services.http_client import CircuitBreaker, OutboundClient
+
+
+@pytest.fixture
+def client():
+    client = OutboundClient()
+    client.register('flaky', retries=0, failure_threshold=2, reset_timeout=60)
+    yield client
+    client.close()
+
+
+def test_circuit_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_circuit_breaker_half_open_trial_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    # The reset timeout has passed, so exactly one trial call is let through:
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_outbound_client_fails_fast_when_provider_is_down(client, monkeypatch):
+    calls = []
+
+    def refuse(*args, **kwargs):
+        calls.append(args)
+        raise requests.ConnectionError('connection refused')
+
+    monkeypatch.setattr(client._sessions['flaky'], 'get', refuse)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError) as error:
+            client.get('flaky', 'http://example.invalid/')
+        assert error.value.status_code == 502
+
+    # The breaker is now open: no more calls reach the provider.
+    with pytest.raises(CircuitOpenError) as error:
+        client.get('flaky', 'http://example.invalid/')
+    assert error.value.status_code == 503
+    assert len(calls) == 2
+    assert client.stats()['flaky']['breaker']['state'] == 'open'
+
+
+def test_outbound_client_passes_provider_timeouts(client, monkeypatch):
+    seen = {}
+
+    class Ok:
+        status_code = 200
+
+    def fake_get(url, timeout=None, **kwargs):
+        seen['timeout'] = timeout
+        return Ok()
+
+    monkeypatch.setattr(client._sessions['flaky'], 'get', fake_get)
+    client.get('flaky', 'http://example.invalid/')
+    assert seen['timeout'] == (3.05, 10)
+
+
+def test_outbound_client_settles_half_open_trial_on_unexpected_errors(client, monkeypatch):
+    breaker = client._breakers['flaky']
+    breaker.reset_timeout = 0
+    breaker.record_failure()
+    breaker.record_failure()
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(client._sessions['flaky'], 'get', crash)
+    with pytest.raises(KeyboardInterrupt):
+        client.get('flaky', 'http://example.invalid/')
+
+    # The trial failed, so the circuit re-opened instead of staying half-open forever:
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+
+def test_outbound_client_logs_stats_periodically(client, monkeypatch, caplog):
+    class Ok:
+        status_code = 200
+
+    monkeypatch.setattr(client._sessions['flaky'], 'get', lambda url, **kwargs: Ok())
+    client.stats_log_interval = 1
+    client._stats_logged_at -= 2
+
+    with caplog.at_level('INFO'):
+        client.get('flaky', 'http://example.invalid/')
+        client.get('flaky', 'http://example.invalid/')
+    assert [record.message for record in caplog.records if 'Outbound HTTP stats' in record.message] == [
+        f"Outbound HTTP stats: {client.stats()}"
+    ]
@@ -14,14 +14,18 @@ def test_client():
         yield app.test_client()
         db.drop_all()
 
+
 @pytest.fixture
 def auth_token(test_client):
     # Create test user and get an auth token
     with test_client.application.app_context():
-        user = User(username='testuser', email='test@test.com')
-        user.set_password('password')
-        db.session.add(user)
-        db.session.commit()
+        # Usernames are unique, so reuse the user created by an earlier test in this module:
+        user = User.query.filter_by(username='testuser').first()
+        if user is None:
+            user = User(username='testuser', email='test@test.com')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
 
         access_token = create_access_token(identity={'id': user.id})
     return access_token
@@ -163,3 +167,124 @@ def test_delete_all_items(test_client, auth_token, packing_list):
     assert len(item_ids) == 0
 
 
+def test_toggle_checks_ownership_in_one_query(test_client, auth_token, packing_list, count_queries):
+    item_id = test_client.get(
+        f'/packing-list/{packing_list}', headers={'Authorization': f'Bearer {auth_token}'}
+    ).json['items'][0]['id']
+
+    with count_queries() as statements:
+        response = test_client.patch(
+            f'/packing-list/{packing_list}/items/{item_id}/toggle',
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+    assert response.status_code == 200
+    # One SELECT (item joined to its list) plus the item and data version UPDATEs:
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 1, selects
+    assert 'JOIN packing_list' in selects[0]
+
+
+def test_item_routes_reject_other_users(test_client, auth_token, packing_list):
+    with test_client.application.app_context():
+        other = User.query.filter_by(username='otheritemuser').first()
+        if other is None:
+            other = User(username='otheritemuser', email='other@test.com', password='x')
+            db.session.add(other)
+            db.session.commit()
+        other_token = create_access_token(identity={'id': other.id})
+        item_id = Item.query.filter_by(listId=packing_list).first().id
+
+    headers = {'Authorization': f'Bearer {other_token}'}
+    assert test_client.patch(f'/packing-list/{packing_list}/items/{item_id}/toggle', headers=headers).status_code == 403
+    assert test_client.put(f'/packing-list/{packing_list}/items/{item_id}', json={'quantity': 2}, headers=headers).status_code == 403
+    assert test_client.delete(f'/packing-list/{packing_list}/items/{item_id}', headers=headers).status_code == 403
+    assert test_client.delete(f'/packing-list/{packing_list}/items/999999', headers=headers).status_code == 404
+
+
+def test_delete_item_delta_response(test_client, auth_token, packing_list, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    item_id = test_client.post(f'/packing-list/{packing_list}/items', json={'description': 'Spare'}, headers=headers).json['item']['id']
+    test_client.patch(f'/packing-list/{packing_list}/items/{item_id}/toggle', headers=headers)
+    etag = test_client.get('/packing-list', headers=headers).headers['ETag']
+
+    with count_queries() as statements:
+        response = test_client.delete(f'/packing-list/{packing_list}/items/{item_id}?response=delta', headers=headers)
+    assert response.status_code == 200
+    assert response.json['deleted'] == [item_id]
+    assert response.json['listId'] == packing_list
+    assert (response.json['itemCount'], response.json['packedCount']) == (1, 0)
+    assert 'packing_list' not in response.json
+    # Item lookup and the counts; the list isn't reloaded or serialized:
+    assert len([statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]) == 2
+
+    # The version is the one the collection ETags now carry:
+    new_etag = test_client.get('/packing-list', headers=headers).headers['ETag']
+    assert new_etag != etag
+    assert new_etag.strip('"').split('-')[1] == str(response.json['version'])
+
+
+def test_delete_all_items_prefer_minimal(test_client, auth_token, packing_list):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    extra_id = test_client.post(f'/packing-list/{packing_list}/items', json={'description': 'Extra'}, headers=headers).json['item']['id']
+
+    response = test_client.delete(f'/packing-list/{packing_list}/items', headers={**headers, 'Prefer': 'return=minimal'})
+    assert response.status_code == 200
+    assert response.headers['Preference-Applied'] == 'return=minimal'
+    assert extra_id in response.json['deleted']
+    assert (response.json['itemCount'], response.json['packedCount']) == (0, 0)
+
+
+def test_batch_item_operations(test_client, auth_token, packing_list, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    ids = [
+        test_client.post(f'/packing-list/{packing_list}/items', json={'description': f'Batch {i}'}, headers=headers).json['item']['id']
+        for i in range(4)
+    ]
+
+    operations = [
+        {'op': 'toggle', 'id': ids[0]},
+        {'op': 'toggle', 'id': ids[0]},
+        {'op': 'toggle', 'id': ids[0]},                      # net: packed
+        {'op': 'set_packed', 'id': ids[1], 'packed': True},
+        {'op': 'update', 'id': ids[2], 'quantity': 4},
+        {'op': 'delete', 'id': ids[3]},
+        {'op': 'toggle', 'id': ids[3]},                      # already deleted
+        {'op': 'add', 'description': 'Batch added', 'quantity': 2},
+        {'op': 'explode', 'id': ids[0]},
+        {'op': 'update', 'id': ids[2], 'quantity': 'many'},
+    ]
+    with count_queries() as statements:
+        response = test_client.post(f'/packing-list/{packing_list}/items/batch', json={'operations': operations}, headers=headers)
+    assert response.status_code == 200
+
+    results = response.json['results']
+    assert [result['status'] for result in results] == ['ok'] * 6 + ['error', 'ok', 'error', 'error']
+    assert [result['packed'] for result in results[:3]] == [True, False, True]
+    added_id = results[7]['id']
+
+    items = {item['id']: item for item in test_client.get(f'/packing-list/{packing_list}', headers=headers).json['items']}
+    assert items[ids[0]]['packed'] is True and items[ids[1]]['packed'] is True
+    assert items[ids[2]]['quantity'] == 4
+    # (SQLite may hand the deleted id to the added item, so check by description)
+    assert 'Batch 3' not in [item['description'] for item in items.values()]
+    assert items[added_id]['description'] == 'Batch added'
+    assert (response.json['itemCount'], response.json['packedCount']) == (len(items), sum(item['packed'] for item in items.values()))
+
+    # One DELETE (plus its tombstones), one bulk UPDATE per distinct column set, one INSERT and the data version bump:
+    writes = [statement for statement in statements if statement.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))]
+    assert len(writes) <= 6, writes
+
+
+def test_batch_item_operations_validates_request(test_client, auth_token, packing_list):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    assert test_client.post(f'/packing-list/{packing_list}/items/batch', json={'operations': []}, headers=headers).status_code == 400
+    assert test_client.post(f'/packing-list/{packing_list}/items/batch', json={}, headers=headers).status_code == 400
+    assert test_client.post('/packing-list/999999/items/batch', json={'operations': [{'op': 'toggle', 'id': 1}]}, headers=headers).status_code == 404
+
+
+def test_batch_item_operations_rejects_non_integer_ids(test_client, auth_token, packing_list):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    operations = [{'op': 'toggle', 'id': id} for id in ({}, [1], True, '1', 1.0)]
+    response = test_client.post(f'/packing-list/{packing_list}/items/batch', json={'operations': operations}, headers=headers)
+    assert response.status_code == 200
+    assert [(result['status'], result['message']) for result in response.json['results']] == [('error', 'id must be an integer')] * 5
@@ -23,10 +23,13 @@ def test_client():
 def auth_token(test_client):
     # Create a test user and get an auth token
     with test_client.application.app_context():
-        user = User(username='testuser', email='test@test.com')
-        user.set_password('password')
-        db.session.add(user)
-        db.session.commit()
+        # Usernames are unique, so reuse the user created by an earlier test in this module:
+        user = User.query.filter_by(username='testuser').first()
+        if user is None:
+            user = User(username='testuser', email='test@test.com')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
 
         # Make sure user instance is still bound to the session
         db.session.refresh(user) # Refres user to ensure it's up-to-date
@@ -129,11 +132,14 @@ def test_update_list(test_client, auth_token):
     )
 
     list_id = response.json['packingList']['id']
+    initial_item_id = response.json['packingList']['items'][0]['id']
 
-    # Update list with new items
+    # Update list with new items (items is the full set, so keep the initial one):
     response = test_client.put(
         f'/packing-list/{list_id}',
-        json={'listName': 'Updated List Name', 'items': [{'id': None, 'description': 'New Item', 'quantity': 1}]},
+        json={'listName': 'Updated List Name', 'items': [
+            {'id': initial_item_id}, {'id': None, 'description': 'New Item', 'quantity': 1}
+        ]},
         headers={'Authorization': f'Bearer {auth_token}'}
     )
 
@@ -180,3 +186,156 @@ def test_get_list_by_id(test_client, auth_token):
 
     assert response.status_code == 404
     assert response.json['message'] == 'Packing list not found'
+
+
+def test_get_lists_is_conditional(test_client, auth_token, packing_list):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    response = test_client.get('/packing-list', headers=headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    # Unchanged: 304 with no body
+    response = test_client.get('/packing-list', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # Toggling an item counts as a change to the user's lists:
+    item_id = test_client.get(f'/packing-list/{packing_list}', headers=headers).json['items'][0]['id']
+    test_client.patch(f'/packing-list/{packing_list}/items/{item_id}/toggle', headers=headers)
+
+    response = test_client.get('/packing-list', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_get_lists_loads_items_in_constant_queries(test_client, auth_token, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    for i in range(4):
+        test_client.post('/packing-list', json={
+            'listName': f'Trip {i}', 'items': [{'description': 'Socks'}, {'description': 'Charger'}]
+        }, headers=headers)
+
+    with count_queries() as statements:
+        response = test_client.get('/packing-list', headers=headers)
+    assert response.status_code == 200
+    assert all(len(plist['items']) >= 1 for plist in response.json)
+    # Data version, lists, and all their items; the same however many lists there are:
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 3, selects
+
+
+def test_get_lists_summary_view(test_client, auth_token, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    list_id = test_client.post('/packing-list', json={
+        'listName': 'Summary Trip', 'items': [{'description': 'Tent', 'packed': True}, {'description': 'Stove'}]
+    }, headers=headers).json['packingList']['id']
+    empty_id = test_client.post('/packing-list', json={'listName': 'Empty Trip'}, headers=headers).json['packingList']['id']
+
+    with count_queries() as statements:
+        response = test_client.get('/packing-list?view=summary', headers=headers)
+    assert response.status_code == 200
+    assert len([statement for statement in statements if 'item' in statement.lower()]) == 1
+
+    summaries = {plist['id']: plist for plist in response.json}
+    assert summaries[list_id]['listName'] == 'Summary Trip'
+    assert (summaries[list_id]['itemCount'], summaries[list_id]['packedCount']) == (2, 1)
+    assert (summaries[empty_id]['itemCount'], summaries[empty_id]['packedCount']) == (0, 0)
+    assert 'items' not in summaries[list_id]
+
+    assert test_client.get('/packing-list?view=tiny', headers=headers).status_code == 400
+
+
+def test_update_list_applies_item_diff_in_bulk(test_client, auth_token, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    items = test_client.post('/packing-list', json={'listName': 'Diff Trip', 'items': [
+        {'description': f'Item {i}'} for i in range(6)
+    ]}, headers=headers).json['packingList']['items']
+    list_id = items[0]['listId']
+
+    desired = [
+        {'id': items[0]['id']},                                      # unchanged
+        {'id': items[1]['id'], 'packed': True},                      # updated
+        {'id': items[2]['id'], 'description': 'Renamed', 'quantity': 3},
+        {'description': 'Brand new', 'quantity': 2},                 # added
+        {'description': 'Also new'},
+    ]                                                                # items 3-5 deleted
+    with count_queries() as statements:
+        response = test_client.put(f'/packing-list/{list_id}', json={'items': desired}, headers=headers)
+    assert response.status_code == 200
+
+    result = {item['description']: item for item in response.json['packing_list']['items']}
+    assert set(result) == {'Item 0', 'Item 1', 'Renamed', 'Brand new', 'Also new'}
+    assert result['Item 1']['packed'] is True
+    assert result['Renamed']['quantity'] == 3
+    assert (result['Brand new']['quantity'], result['Also new']['quantity'], result['Also new']['packed']) == (2, 1, False)
+
+    # The same handful of statements whatever the number of items:
+    writes = [statement for statement in statements if statement.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))]
+    assert len(writes) <= 6, writes
+
+
+def test_update_list_rejects_foreign_item_ids(test_client, auth_token):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    first = test_client.post('/packing-list', json={'listName': 'A', 'items': [{'description': 'a'}]}, headers=headers).json['packingList']
+    second = test_client.post('/packing-list', json={'listName': 'B', 'items': [{'description': 'b'}]}, headers=headers).json['packingList']
+
+    response = test_client.put(f"/packing-list/{first['id']}", json={'items': [{'id': second['items'][0]['id']}]}, headers=headers)
+    assert response.status_code == 400
+    response = test_client.put(f"/packing-list/{first['id']}", json={'items': [{'description': ''}]}, headers=headers)
+    assert response.status_code == 400
+    for item_id in ([first['items'][0]['id']], {}, True):
+        response = test_client.put(f"/packing-list/{first['id']}", json={'items': [{'id': item_id}]}, headers=headers)
+        assert response.status_code == 400
+
+    # Nothing changed:
+    assert test_client.get(f"/packing-list/{second['id']}", headers=headers).json['items'] == second['items']
+    assert test_client.get(f"/packing-list/{first['id']}", headers=headers).json['items'] == first['items']
+
+
+def test_clone_template_copies_items_in_the_database(test_client, auth_token, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    template = test_client.post('/packing-list', json={'listName': 'Beach trip', 'isTemplate': True, 'items': [
+        {'description': 'Towel', 'packed': True}, {'description': 'Sunscreen', 'quantity': 2}, {'description': 'Hat'}
+    ]}, headers=headers).json['packingList']
+    assert template['isTemplate'] is True
+
+    assert [t['id'] for t in test_client.get('/packing-list/templates', headers=headers).json] == [template['id']]
+
+    with count_queries() as statements:
+        response = test_client.post(f"/packing-list/{template['id']}/clone", json={'listName': 'Nice, July'}, headers=headers)
+    assert response.status_code == 201
+    clone = response.json['packingList']
+    assert (clone['listName'], clone['isTemplate'], clone['itemCount']) == ('Nice, July', False, 3)
+    # Items are copied with INSERT ... SELECT; none are read back into Python:
+    assert any(statement.lstrip().upper().startswith('INSERT INTO ITEM') and 'SELECT' in statement.upper() for statement in statements)
+    assert not any(statement.lstrip().upper().startswith('SELECT') and 'FROM item' in statement for statement in statements)
+
+    items = test_client.get(f"/packing-list/{clone['id']}", headers=headers).json['items']
+    assert [(item['description'], item['quantity'], item['packed']) for item in items] == [
+        ('Towel', 1, False), ('Sunscreen', 2, False), ('Hat', 1, False)
+    ]
+    # The template itself is untouched:
+    assert len(test_client.get(f"/packing-list/{template['id']}", headers=headers).json['items']) == 3
+
+
+def test_clone_requires_own_list(test_client, auth_token):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    assert test_client.post('/packing-list/999999/clone', json={}, headers=headers).status_code == 404
+
+
+def test_delete_list_cascades_in_the_database(test_client, auth_token, count_queries):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    list_id = test_client.post('/packing-list', json={'listName': 'Big trip', 'items': [
+        {'description': f'Item {i}'} for i in range(50)
+    ]}, headers=headers).json['packingList']['id']
+
+    with count_queries() as statements:
+        response = test_client.delete(f'/packing-list/{list_id}', headers=headers)
+    assert response.status_code == 200
+
+    # Items are neither loaded nor deleted one by one; ON DELETE CASCADE removes them:
+    assert not any('FROM item' in statement for statement in statements), statements
+    assert not any(statement.lstrip().upper().startswith('DELETE FROM ITEM') for statement in statements)
+    with test_client.application.app_context():
+        assert Item.query.filter_by(listId=list_id).count() == 0
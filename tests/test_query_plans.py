@@ -0,0 +1,78 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import text, and_, or_
+from app import create_app, db
+from app.models.user import User
+from app.models.expense import Expense
+from app.models.packing_list import PackingList
+from app.models.item import Item
+from app.models.deleted_record import DeletedRecord
+
+
+# Guards the indexes behind our hottest queries: if a model or query change makes one of
+# them fall back to a full table scan or a sort, EXPLAIN QUERY PLAN will show it.
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def query_plan(query):
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(plan, index_name):
+    assert any(f'INDEX {index_name}' in step for step in plan), plan
+    assert not any(step.startswith('SCAN') and 'INDEX' not in step for step in plan), plan
+    assert not any('TEMP B-TREE' in step for step in plan), plan
+
+
+def test_user_lookup_by_username_uses_index(app):
+    assert_uses_index(query_plan(User.query.filter_by(username='testuser')), 'ix_user_username')
+
+
+def test_expense_pages_use_index(app):
+    query = Expense.query.filter(
+        Expense.user_id == 1,
+        or_(Expense.date < date(2024, 5, 1), and_(Expense.date == date(2024, 5, 1), Expense.id < 10))
+    ).order_by(Expense.date.desc(), Expense.id.desc()).limit(51)
+    assert_uses_index(query_plan(query), 'ix_expense_user_id_date_id')
+
+
+def test_expense_pages_filtered_by_category_use_index(app):
+    query = Expense.query.filter(
+        Expense.user_id == 1, Expense.category == 'Food', Expense.date >= date(2024, 1, 1)
+    ).order_by(Expense.date.desc(), Expense.id.desc()).limit(51)
+    assert_uses_index(query_plan(query), 'ix_expense_user_id_category_date_id')
+
+
+def test_packing_lists_by_user_use_index(app):
+    assert_uses_index(query_plan(PackingList.query.filter_by(user_id=1)), 'ix_packing_list_user_id')
+
+
+def test_items_by_list_use_index(app):
+    assert_uses_index(query_plan(Item.query.filter_by(listId=1)), 'ix_item_listId')
+
+
+def test_register_rejects_duplicate_username(app):
+    client = app.test_client()
+    user = {'username': 'duplicate', 'password': 'secret', 'email': 'duplicate@test.com'}
+
+    assert client.post('/user/register', json=user).status_code == 200
+    response = client.post('/user/register', json=user)
+    assert response.status_code == 400
+    assert response.json['message'] == 'User already exists'
+
+
+def test_sync_changes_use_index(app):
+    since = datetime(2024, 1, 1)
+    assert_uses_index(query_plan(Expense.query.filter(Expense.user_id == 1, Expense.updated_at > since)),
+                      'ix_expense_user_id_updated_at')
+    assert_uses_index(query_plan(DeletedRecord.query.filter(DeletedRecord.user_id == 1, DeletedRecord.deleted_at > since)),
+                      'ix_deleted_record_user_id_deleted_at')
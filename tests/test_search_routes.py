@@ -0,0 +1,113 @@
+import pytest
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from app import create_app, db
+from app.models.item import Item
+from app.models.user import User
+from app.services.search import resource_query
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+def make_headers(test_client, username):
+    with test_client.application.app_context():
+        user = User(username=username, email=f'{username}@test.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        return {'Authorization': f'Bearer {create_access_token(identity={"id": user.id})}'}
+
+
+@pytest.fixture(scope='module')
+def headers(test_client):
+    headers = make_headers(test_client, 'searchuser')
+    test_client.post('/packing-list', json={'listName': 'Airport run', 'items': [
+        {'description': 'Passport'}, {'description': 'Passport adapter plug'}, {'description': 'Toothbrush'}
+    ]}, headers=headers)
+    test_client.post('/expenses', json={
+        'amount': 40, 'description': 'Taxi to the airport', 'date': '2024-05-01', 'category': 'Transport'
+    }, headers=headers)
+    test_client.post('/expenses', json={
+        'amount': 12, 'description': 'Lunch', 'date': '2024-05-01', 'category': 'Food'
+    }, headers=headers)
+
+    # Someone else's matching rows never show up:
+    other = make_headers(test_client, 'othersearchuser')
+    test_client.post('/packing-list', json={'listName': 'Airport', 'items': [{'description': 'Passport adapter'}]}, headers=other)
+    return headers
+
+
+def search(test_client, headers, query):
+    response = test_client.get(f'/search?{query}', headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_search_ranks_hits_across_resources(test_client, headers):
+    hits = search(test_client, headers, 'q=passport adapter')['results']
+    assert [hit['text'] for hit in hits] == ['Passport adapter plug']
+    assert hits[0]['type'] == 'item' and hits[0]['listId'] is not None
+
+    # Stemming, and every resource type:
+    hits = search(test_client, headers, 'q=airports')['results']
+    assert sorted((hit['type'], hit['text']) for hit in hits) == [('expense', 'Taxi to the airport'), ('packing_list', 'Airport run')]
+    assert all(hit['score'] > 0 for hit in hits)
+
+    hits = search(test_client, headers, 'q=airport&types=expenses')['results']
+    assert [hit['text'] for hit in hits] == ['Taxi to the airport']
+
+
+def test_search_paginates(test_client, headers):
+    first = search(test_client, headers, 'q=passport&limit=1')
+    assert len(first['results']) == 1 and first['nextOffset'] == 1
+    second = search(test_client, headers, f"q=passport&limit=1&offset={first['nextOffset']}")
+    assert second['nextOffset'] is None
+    assert {first['results'][0]['text'], second['results'][0]['text']} == {'Passport', 'Passport adapter plug'}
+
+
+def test_search_follows_mutations(test_client, headers):
+    packing_list = test_client.post('/packing-list', json={'listName': 'Hiking', 'items': [{'description': 'Headlamp'}]},
+                                    headers=headers).json['packingList']
+    item_id = packing_list['items'][0]['id']
+    assert len(search(test_client, headers, 'q=headlamp')['results']) == 1
+
+    test_client.put(f"/packing-list/{packing_list['id']}/items/{item_id}", json={'description': 'Flashlight'}, headers=headers)
+    assert search(test_client, headers, 'q=headlamp')['results'] == []
+    assert len(search(test_client, headers, 'q=flashlight')['results']) == 1
+
+    test_client.delete(f"/packing-list/{packing_list['id']}", headers=headers)
+    assert search(test_client, headers, 'q=flashlight')['results'] == []
+    assert search(test_client, headers, 'q=hiking')['results'] == []
+
+
+def test_search_validates_arguments(test_client, headers):
+    assert test_client.get('/search', headers=headers).status_code == 400
+    assert test_client.get('/search?q=x&types=users', headers=headers).status_code == 400
+    assert test_client.get('/search?q=x&limit=0', headers=headers).status_code == 400
+    assert test_client.get('/search?q=x&offset=-1', headers=headers).status_code == 400
+    # Past SEARCH_MAX_OFFSET (and far past what an SQL integer holds):
+    assert test_client.get('/search?q=x&offset=10001', headers=headers).status_code == 400
+    assert test_client.get(f'/search?q=x&offset={2 ** 70}', headers=headers).status_code == 400
+    # Query syntax characters are treated as plain text:
+    assert search(test_client, headers, 'q="passport" OR -adapter*')['results'] is not None
+
+
+def test_postgresql_search_query_matches_the_gin_index(test_client, monkeypatch):
+    # Tests run on SQLite, so compile the PostgreSQL branch without executing it:
+    monkeypatch.setattr(db.session, 'get_bind', lambda: SimpleNamespace(dialect=SimpleNamespace(name='postgresql')))
+    query = resource_query('item', Item, 'description', 'item_fts', 7, ['passport', 'adapter'])
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+    # The same expression as the index built by postgresql_ddl, so the planner can use it:
+    assert "to_tsvector('english'::regconfig, item.description) @@ plainto_tsquery('english'::regconfig, 'passport adapter')" in sql
+    assert "ts_rank(to_tsvector('english'::regconfig, item.description)" in sql
+    assert 'packing_list.user_id = 7' in sql
+    assert 'item_fts' not in sql
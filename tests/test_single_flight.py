@@ -0,0 +1,102 @@
+import threading
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'forecast': 'sunny'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('paris', slow_fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+
+    # Let every caller join the in-flight call before the leader finishes:
+    while flights.coalesced < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{'forecast': 'sunny'}] * 5
+    assert flights.in_flight() == 0
+
+
+def test_waiters_share_the_leaders_error():
+    flights = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing_fetch():
+        release.wait(5)
+        raise RuntimeError('upstream down')
+
+    def call():
+        try:
+            flights.do('rome', failing_fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flights.coalesced < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ['upstream down'] * 3
+
+
+def test_calls_after_completion_run_again():
+    flights = SingleFlight()
+    assert flights.do('oslo', lambda: 1) == 1
+    assert flights.do('oslo', lambda: 2) == 2
+
+    with pytest.raises(ValueError):
+        flights.do('oslo', lambda: int('not a number'))
+    assert flights.in_flight() == 0
+
+
+def test_waiters_fail_when_the_leader_is_interrupted():
+    # Stands in for GreenletExit / gevent.Timeout, which aren't Exception subclasses:
+    class Interrupted(BaseException):
+        pass
+
+    flights = SingleFlight()
+    release = threading.Event()
+    outcomes = []
+
+    def interrupted_fetch():
+        release.wait(5)
+        raise Interrupted()
+
+    def call():
+        try:
+            outcomes.append(flights.do('lima', interrupted_fetch))
+        except Interrupted:
+            outcomes.append('interrupted')
+        except RuntimeError:
+            outcomes.append('error')
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flights.coalesced < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    # The leader sees its own interruption; nobody gets a None result:
+    assert sorted(outcomes) == ['error', 'error', 'interrupted']
+    assert flights.in_flight() == 0
@@ -0,0 +1,95 @@
+import base64
+import pytest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.deleted_record import DeletedRecord
+from app.models.user import User
+from app.routes.sync_routes import encode_sync_cursor
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+    # No look-back, so the test sees exactly what changed after each cursor:
+    app.config['SYNC_OVERLAP_SECONDS'] = 0
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+@pytest.fixture(scope='module')
+def headers(test_client):
+    with test_client.application.app_context():
+        user = User(username='syncuser', email='sync@test.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        access_token = create_access_token(identity={'id': user.id})
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def test_sync_returns_only_changes_since_cursor(test_client, headers):
+    expense_id = test_client.post('/expenses', json={
+        'amount': 12, 'description': 'Lunch', 'date': '2024-05-01', 'category': 'Food'
+    }, headers=headers).json['id']
+    gone_expense_id = test_client.post('/expenses', json={
+        'amount': 3, 'description': 'Coffee', 'date': '2024-05-01', 'category': 'Food'
+    }, headers=headers).json['id']
+    packing_list = test_client.post('/packing-list', json={'listName': 'Sync trip', 'items': [
+        {'description': 'Socks'}, {'description': 'Shoes'}, {'description': 'Hat'}
+    ]}, headers=headers).json['packingList']
+    socks, shoes, hat = [item['id'] for item in packing_list['items']]
+
+    first = test_client.get('/sync', headers=headers).json
+    assert first['full'] is True
+    assert {expense['id'] for expense in first['expenses']} == {expense_id, gone_expense_id}
+    assert [plist['id'] for plist in first['packingLists']] == [packing_list['id']]
+    assert 'items' not in first['packingLists'][0]
+    assert len(first['items']) == 3
+
+    # Nothing changed yet:
+    unchanged = test_client.get(f"/sync?since={first['cursor']}", headers=headers).json
+    assert (unchanged['expenses'], unchanged['packingLists'], unchanged['items']) == ([], [], [])
+
+    # Single-row, bulk and batch changes all move updated_at:
+    test_client.patch(f"/packing-list/{packing_list['id']}/items/{socks}/toggle", headers=headers)
+    test_client.post(f"/packing-list/{packing_list['id']}/items/batch", json={'operations': [
+        {'op': 'update', 'id': shoes, 'quantity': 2}, {'op': 'delete', 'id': hat}
+    ]}, headers=headers)
+    test_client.patch('/expenses/batch', json={'ids': [expense_id], 'changes': {'category': 'Dining'}}, headers=headers)
+    test_client.delete(f'/expenses/{gone_expense_id}', headers=headers)
+
+    second = test_client.get(f"/sync?since={first['cursor']}", headers=headers).json
+    assert second['full'] is False
+    assert [(expense['id'], expense['category']) for expense in second['expenses']] == [(expense_id, 'Dining')]
+    assert second['packingLists'] == []
+    assert sorted(item['id'] for item in second['items']) == sorted([socks, shoes])
+    assert second['deleted'] == {'expenses': [gone_expense_id], 'packingLists': [], 'items': [hat]}
+
+    test_client.delete(f"/packing-list/{packing_list['id']}", headers=headers)
+    third = test_client.get(f"/sync?since={second['cursor']}", headers=headers).json
+    assert third['deleted']['packingLists'] == [packing_list['id']]
+
+
+def test_sync_rejects_bad_or_expired_cursors(test_client, headers):
+    assert test_client.get('/sync?since=not-a-cursor', headers=headers).status_code == 400
+    # A time zone offset can't be compared with the server's naive UTC times:
+    aware = base64.urlsafe_b64encode(b'2026-10-18T00:00:00+00:00').decode()
+    assert test_client.get(f'/sync?since={aware}', headers=headers).status_code == 400
+    expired = encode_sync_cursor(datetime.utcnow() - timedelta(days=365))
+    assert test_client.get(f'/sync?since={expired}', headers=headers).status_code == 410
+
+
+def test_prune_deleted_records(test_client, headers):
+    with test_client.application.app_context():
+        user_id = User.query.filter_by(username='syncuser').first().id
+        DeletedRecord.record(user_id, 'expense', [900001, 900002])
+        DeletedRecord.query.filter(DeletedRecord.record_id == 900001).update({'deleted_at': datetime.utcnow() - timedelta(days=365)})
+        db.session.commit()
+
+        result = test_client.application.test_cli_runner().invoke(args=['prune-deleted-records'])
+        assert result.exit_code == 0
+        assert DeletedRecord.query.filter_by(resource='expense', record_id=900001).count() == 0
+        assert DeletedRecord.query.filter_by(resource='expense', record_id=900002).count() == 1
@@ -0,0 +1,255 @@
+import pytest
+from app import create_app, db, forecast_cache, outbound
+from app.models.user import User
+from app.models.city_location import CityLocation
+from flask_jwt_extended import create_access_token
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture(scope='module')
+def test_client():
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.drop_all()
+
+
+@pytest.fixture
+def auth_token(test_client):
+    with test_client.application.app_context():
+        # Usernames are unique, so reuse the user created by an earlier test in this module:
+        user = User.query.filter_by(username='weatheruser').first()
+        if user is None:
+            user = User(username='weatheruser', email='weather@test.com')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+
+        access_token = create_access_token(identity={'id': user.id})
+    return access_token
+
+
+@pytest.fixture
+def upstream_calls(monkeypatch):
+    # Record every OpenWeather call and answer with a canned payload:
+    calls = []
+
+    def fake_get(provider, url, *args, **kwargs):
+        calls.append(url)
+        if '/geo/' in url:
+            return FakeResponse([{'name': 'Paris', 'lat': 48.85, 'lon': 2.35, 'country': 'FR'}])
+        return FakeResponse({'city': {'name': 'Paris'}, 'list': [{'dt': len(calls)}]})
+
+    forecast_cache.clear()
+    monkeypatch.setattr(outbound, 'get', fake_get)
+    return calls
+
+
+def test_get_weather_requires_city(test_client, auth_token):
+    response = test_client.get('/weather', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'City is required'
+
+
+def test_get_weather_is_cached_per_normalized_query(test_client, auth_token, upstream_calls):
+    response = test_client.get('/weather?city=Paris&country=FR', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert response.json['city']['name'] == 'Paris'
+    calls_after_first_request = len(upstream_calls)
+
+    response = test_client.get('/weather?city=%20paris&country=fr', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert len(upstream_calls) == calls_after_first_request
+    assert forecast_cache.stats()['hits'] == 1
+
+
+def test_get_weather_serves_stale_while_refreshing(test_client, auth_token, upstream_calls, monkeypatch):
+    monkeypatch.setattr(forecast_cache, 'ttl', 0)
+
+    first = test_client.get('/weather?city=Paris', headers={'Authorization': f'Bearer {auth_token}'})
+    calls_after_first_request = len(upstream_calls)
+
+    # The stale entry is returned right away and a background refresh replaces it:
+    second = test_client.get('/weather?city=Paris', headers={'Authorization': f'Bearer {auth_token}'})
+    assert second.json == first.json
+    forecast_cache.wait_for_refreshes(timeout=5)
+    assert len(upstream_calls) > calls_after_first_request
+    assert forecast_cache.stats()['stale_hits'] == 1
+
+
+def test_get_weather_upstream_errors_are_not_cached(test_client, auth_token, monkeypatch):
+    forecast_cache.clear()
+    monkeypatch.setattr(outbound, 'get', lambda provider, url, *args, **kwargs: FakeResponse({}, 404))
+
+    response = test_client.get('/weather?city=Atlantis', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 404
+    assert response.json['error'] == 'Failed to fetch city coordinates'
+    assert forecast_cache.stats()['size'] == 0
+
+
+def test_get_weather_geocodes_once_and_stores_coordinates(test_client, auth_token, upstream_calls):
+    response = test_client.get('/weather?city=Lyon&country=FR', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert sum('/geo/' in url for url in upstream_calls) == 1
+
+    with test_client.application.app_context():
+        location = CityLocation.lookup('lyon', 'fr')
+        assert (location.lat, location.lon) == (48.85, 2.35)
+
+    # A cold cache still skips geocoding now that the coordinates are stored locally:
+    forecast_cache.clear()
+    upstream_calls.clear()
+    response = test_client.get('/weather?city=Lyon&country=FR', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert len(upstream_calls) == 1
+    assert '/geo/' not in upstream_calls[0]
+
+
+def test_seed_cities_command(test_client):
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(args=['seed-cities'])
+    assert 'Seeded' in result.output
+
+    with test_client.application.app_context():
+        assert CityLocation.lookup('new york', 'us') is not None
+        # Seeding twice doesn't duplicate rows:
+        count = CityLocation.query.count()
+        runner.invoke(args=['seed-cities'])
+        assert CityLocation.query.count() == count
+
+
+def test_get_weather_compact_view_aggregates_local_days(test_client, auth_token, monkeypatch):
+    # Three slots around midnight UTC; at UTC-5 (-18000s) they all fall on the same local day.
+    forecast = {
+        'city': {'name': 'New York', 'country': 'US', 'timezone': -18000},
+        'list': [
+            {'dt': 1735689600, 'main': {'temp_min': 1.0, 'temp_max': 4.0},
+             'weather': [{'main': 'Snow', 'icon': '13n'}], 'snow': {'3h': 0.5}, 'pop': 0.6},
+            {'dt': 1735700400, 'main': {'temp_min': -2.0, 'temp_max': 0.5},
+             'weather': [{'main': 'Snow', 'icon': '13n'}], 'snow': {'3h': 1.25}, 'pop': 0.9},
+            {'dt': 1735678800, 'main': {'temp_min': -3.0, 'temp_max': -1.0},
+             'weather': [{'main': 'Clouds', 'icon': '04n'}], 'pop': 0.1}
+        ]
+    }
+    forecast_cache.clear()
+    monkeypatch.setattr(forecast_cache, 'get', lambda key, loader: forecast)
+
+    response = test_client.get('/weather?city=New York&view=compact', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    assert response.json['city']['name'] == 'New York'
+    assert response.json['days'] == [{
+        'date': '2024-12-31',
+        'temp_min': -3.0,
+        'temp_max': 4.0,
+        'precipitation': 1.75,
+        'pop': 0.9,
+        'summary': 'Snow',
+        'icon': '13n'
+    }]
+
+    response = test_client.get('/weather?city=New York&view=compact&fields=date,temp_max', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.json['days'] == [{'date': '2024-12-31', 'temp_max': 4.0}]
+
+    response = test_client.get('/weather?city=New York&fields=city', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.json == {'city': forecast['city']}
+
+    response = test_client.get('/weather?city=New York&view=compact&fields=humidity', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 400
+
+
+def test_get_weather_batch_reports_partial_failures(test_client, auth_token, monkeypatch):
+    calls = []
+
+    def fake_get(provider, url, params=None, **kwargs):
+        calls.append(params)
+        if '/geo/' in url:
+            if params['q'].startswith('atlantis'):
+                return FakeResponse([])
+            return FakeResponse([{'lat': 1.0, 'lon': 2.0}])
+        return FakeResponse({'city': {'name': 'Somewhere'}, 'list': []})
+
+    forecast_cache.clear()
+    forecast_cache.set(('rome', 'it'), {'city': {'name': 'Rome'}, 'list': []})
+    monkeypatch.setattr(outbound, 'get', fake_get)
+
+    response = test_client.post(
+        '/weather/batch',
+        json={'destinations': [
+            {'city': 'Rome', 'country': 'IT'},
+            {'city': 'Oslo'},
+            {'city': 'Atlantis'},
+            {'city': 'oslo '}
+        ]},
+        headers={'Authorization': f'Bearer {auth_token}'}
+    )
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [result['city'] for result in results] == ['Rome', 'Oslo', 'Atlantis', 'oslo ']
+    assert results[0]['forecast']['city']['name'] == 'Rome'
+    assert results[1]['forecast'] == results[3]['forecast']
+    assert results[2] == {'city': 'Atlantis', 'country': None, 'error': 'City not found', 'status': 404}
+    assert response.json['failed'] == 1
+
+    # Rome came from the cache and the duplicate Oslo was only fetched once:
+    assert not any(params.get('q', '').startswith('rome') for params in calls)
+    assert sum(1 for params in calls if 'lat' in params) == 1
+
+
+def test_get_weather_batch_validates_destinations(test_client, auth_token):
+    response = test_client.post('/weather/batch', json={'destinations': []}, headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 400
+
+    response = test_client.post('/weather/batch', json={'destinations': [{'country': 'FR'}]}, headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'City is required for every destination'
+
+    for destination in ({'city': 5}, {'city': ['Paris']}, {'city': 'Paris', 'country': 33}):
+        response = test_client.post('/weather/batch', json={'destinations': [destination]}, headers={'Authorization': f'Bearer {auth_token}'})
+        assert response.status_code == 400
+        assert response.json['error'] == 'City and country must be text'
+
+
+def test_get_weather_batch_reports_unexpected_errors_per_destination(test_client, auth_token, monkeypatch):
+    def fake_get(provider, url, params=None, **kwargs):
+        if '/geo/' in url:
+            return FakeResponse([{'lat': 1.0, 'lon': 2.0}])
+        raise KeyError('list')
+
+    forecast_cache.clear()
+    forecast_cache.set(CityLocation.normalize('Lyon', None), {'city': {'name': 'Lyon'}, 'list': []})
+    monkeypatch.setattr(outbound, 'get', fake_get)
+
+    response = test_client.post(
+        '/weather/batch',
+        json={'destinations': [{'city': 'Lyon'}, {'city': 'Nantes'}]},
+        headers={'Authorization': f'Bearer {auth_token}'}
+    )
+    assert response.status_code == 200
+    results = response.json['results']
+    assert results[0]['forecast']['city']['name'] == 'Lyon'
+    assert results[1] == {'city': 'Nantes', 'country': None, 'error': 'Failed to fetch forecast', 'status': 502}
+    assert response.json['failed'] == 1
+
+
+def test_forecast_cache_evicts_least_recently_used(test_client, monkeypatch):
+    forecast_cache.clear()
+    monkeypatch.setattr(forecast_cache, 'maxsize', 2)
+
+    with test_client.application.app_context():
+        forecast_cache.get('a', lambda: 1)
+        forecast_cache.get('b', lambda: 2)
+        forecast_cache.get('a', lambda: 1)   # touch "a" so "b" is the oldest
+        forecast_cache.get('c', lambda: 3)
+
+    assert forecast_cache.stats()['evictions'] == 1
+    assert forecast_cache.get('a', lambda: 'reloaded') == 1